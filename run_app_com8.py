@@ -14,19 +14,16 @@ Setup:
 
 import sys
 import os
-from pathlib import Path
-from dotenv import load_dotenv
-
-# Load environment variables
-env_path = Path('.env')
-if env_path.exists():
-    load_dotenv(env_path)
 
 # Add src to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
+from src.config.config_manager import load_environment
 from src.main import ContainerReturnSystem
 
+# Load .env so the DEV_* ports below can come from it
+load_environment()
+
 def main():
     """Run application using development port configuration"""
     # Get port configuration from environment
@@ -44,10 +41,12 @@ def main():
     print("-" * 50)
     
     # Set development configuration
-    os.environ['UART_PORT'] = app_port
-    os.environ['UART_BAUDRATE'] = baudrate
-    os.environ['DEBUG'] = 'true'
-    os.environ['LOG_LEVEL'] = 'DEBUG'
+    os.environ.update({
+        'UART_PORT': app_port,
+        'UART_BAUDRATE': baudrate,
+        'DEBUG': 'true',
+        'LOG_LEVEL': 'DEBUG',
+    })
     
     # Create and run application
     app = ContainerReturnSystem()
@@ -4,5 +4,6 @@ Simple API module for server communication
 
 from .client import APIClient
 from .service import APIService
+from .serializers import to_wire, from_wire
 
-__all__ = ['APIClient', 'APIService']
\ No newline at end of file
+__all__ = ['APIClient', 'APIService', 'to_wire', 'from_wire']
\ No newline at end of file
@@ -2,13 +2,73 @@
 Simple API client for healthcheck and sync operations
 """
 
+import gzip
+import json
 import logging
+import random
+from datetime import date
 import requests
-import json
-from typing import Dict, Any, List
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, Any, List, Iterable, Iterator
+
+from .serializers import WIRE_TYPES, to_wire
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
 
 logger = logging.getLogger(__name__)
 
+# Seconds allowed for DNS + TCP/TLS connect; the read budget comes from config
+CONNECT_TIMEOUT = 5
+
+# Request bodies below this size are not worth compressing
+COMPRESS_MIN_BYTES = 1024
+GZIP_HEADERS = {'Content-Encoding': 'gzip'}
+
+# Responses that mean the server did not process the request, so a retry cannot
+# apply a sync twice. 500/502/504 are excluded: the server (or the upstream behind
+# the gateway) may already have stored the uploaded logs, which carry no id to dedupe on
+RETRY_STATUS_CODES = (429, 503)
+
+
+class JitteredRetry(Retry):
+    """Retry policy adding random jitter to the exponential backoff."""
+    
+    def get_backoff_time(self) -> float:
+        backoff = super().get_backoff_time()
+        return backoff + random.uniform(0, 0.25 * backoff)
+
+
+def _json_default(obj: Any) -> Any:
+    """Encode values JSON has no type for: timestamps and database models."""
+    if isinstance(obj, date):
+        return obj.isoformat()
+    if type(obj) in WIRE_TYPES:
+        return to_wire(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _dumps(data: Any) -> bytes:
+    """Serialize a request payload straight to JSON bytes.
+    
+    Payloads may contain datetimes and database models directly; orjson writes
+    datetimes itself, and models go through serializers.to_wire().
+    """
+    if HAS_ORJSON:
+        return orjson.dumps(data, default=_json_default, option=orjson.OPT_PASSTHROUGH_DATACLASS)
+    return json.dumps(data, separators=(',', ':'), default=_json_default).encode('utf-8')
+
+
+def _loads(content: bytes) -> Any:
+    """Parse a JSON response body."""
+    if HAS_ORJSON:
+        return orjson.loads(content)
+    return json.loads(content)
+
 
 class APIClient:
     """Simple API client for server communication."""
@@ -32,6 +92,11 @@ class APIClient:
         if not self.device_name:
             raise ValueError("RASPBERRY_NAME configuration is required")
         
+        # Endpoint URLs are fixed, so build them once
+        self._url_healthcheck = f"{self.base_url}/functions/v1/raspberry-healthcheck"
+        self._url_sync = f"{self.base_url}/functions/v1/raspberry-sync"
+        self._url_validate = f"{self.base_url}/functions/v1/raspberry-container-validate"
+        
         # Build headers
         self.headers = {
             'Content-Type': 'application/json',
@@ -40,39 +105,78 @@ class APIClient:
             'x-name': self.device_name
         }
         
-        # Request timeout
-        self.timeout = self.config.get('api.timeout', 30)
+        # Gzip large request bodies when the server is known to accept them
+        self.compress = self.config.get('api_compression', False)
+        
+        # Request timeout as a (connect, read) tuple
+        self.timeout = (CONNECT_TIMEOUT, self.config.get('api_timeout', 30))
+        
+        # Persistent session keeps connections alive between requests
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        # Retry connection failures and rate-limit/unavailable responses with backoff. Read
+        # errors and gateway errors are not retried since the server may already have
+        # applied a sync it never answered.
+        retry = JitteredRetry(
+            total=self.config.get('api_retry_attempts', 3),
+            read=0,
+            backoff_factor=0.5,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=frozenset(['POST']),
+            respect_retry_after_header=True
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, pool_block=False, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
         
         logger.info(f"API client initialized for device: {self.device_name}")
     
-    def _make_request(self, endpoint: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    def _make_request(self, url: str, data: Dict[str, Any]) -> Dict[str, Any]:
         """Make API request."""
-        url = f"{self.base_url}{endpoint}"
+        return self._make_raw_request(url, _dumps(data))
+    
+    def _make_raw_request(self, url: str, body: bytes) -> Dict[str, Any]:
+        """Make API request with an already encoded JSON body."""
+        headers = None
+        if self.compress and len(body) > COMPRESS_MIN_BYTES:
+            body = gzip.compress(body, compresslevel=1)
+            headers = GZIP_HEADERS
         
         try:
-            response = requests.post(
+            response = self.session.post(
                 url,
-                headers=self.headers,
-                data=json.dumps(data),
+                data=body,
+                headers=headers,
                 timeout=self.timeout
             )
             response.raise_for_status()
-            return response.json()
+            return _loads(response.content)
             
         except requests.exceptions.Timeout:
-            logger.error(f"API request timeout: {endpoint}")
+            logger.error(f"API request timeout: {url}")
             raise
         except requests.exceptions.RequestException as e:
-            logger.error(f"API request failed: {endpoint} - {e}")
+            logger.error(f"API request failed: {url} - {e}")
             raise
     
+    def close(self) -> None:
+        """Close the HTTP session and release pooled connections."""
+        self.session.close()
+        logger.debug("API client session closed")
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+    
     def healthcheck(self, version: str, update_failures: int) -> Dict[str, Any]:
         """Send healthcheck to server."""
         data = {
             "version": version,
             "updateFailures": update_failures
         }
-        return self._make_request('/functions/v1/raspberry-healthcheck', data)
+        return self._make_request(self._url_healthcheck, data)
     
     def sync(self, logs: List[Dict], containers: List[Dict]) -> Dict[str, Any]:
         """Send sync data to server."""
@@ -81,11 +185,33 @@ class APIClient:
             "containers": containers
         }
         logger.debug(f"Sync request data structure: logs={len(logs)}, containers={len(containers)}")
-        return self._make_request('/functions/v1/raspberry-sync', data)
+        return self._make_request(self._url_sync, data)
+    
+    def sync_stream(self, logs: Iterable[Dict], containers: Iterable[Dict]) -> Dict[str, Any]:
+        """Send sync data to server, encoding items as they are produced.
+        
+        The body is framed by hand so no intermediate list of dicts is built.
+        Chunks are joined into one bytes body rather than sent chunked, which
+        keeps the request replayable and lets it carry a Content-Length.
+        """
+        body = b''.join(self._frame_sync_body(logs, containers))
+        return self._make_raw_request(self._url_sync, body)
+    
+    def _frame_sync_body(self, logs: Iterable[Dict], containers: Iterable[Dict]) -> Iterator[bytes]:
+        """Yield the JSON sync body piece by piece."""
+        for key, items in ((b'{"logs":[', logs), (b'],"containers":[', containers)):
+            yield key
+            first = True
+            for item in items:
+                if not first:
+                    yield b','
+                first = False
+                yield _dumps(item)
+        yield b']}'
     
     def validate_container(self, container_id: str) -> Dict[str, Any]:
         """Validate container with server."""
         data = {
             "id": container_id
         }
-        return self._make_request('/functions/v1/raspberry-container-validate', data)
\ No newline at end of file
+        return self._make_request(self._url_validate, data)
\ No newline at end of file
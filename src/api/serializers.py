@@ -0,0 +1,88 @@
+"""
+Conversion between database models and the server's camelCase JSON
+"""
+
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, Mapping, Tuple, Type, TypeVar
+
+from ..database.models import AuditLog, Container, DeviceStatus, field_names, from_epoch, parse_utc, to_epoch
+
+T = TypeVar('T')
+
+# snake_case field -> wire name, for the fields whose names differ
+_SNAKE_TO_CAMEL: Dict[type, Dict[str, str]] = {
+    Container: {
+        'qr_code': 'qrCode',
+        'is_returnable': 'isReturnable',
+        'due_date': 'dueDate',
+        'updated_at': 'updatedAt',
+    },
+    DeviceStatus: {
+        'last_sync_at': 'lastSyncAt',
+        'last_seen_at': 'lastSeenAt',
+        'update_failures': 'updateFailures',
+        'is_in_safe_mode': 'isInSafeMode',
+    },
+    AuditLog: {
+        'is_offline_action': 'isOfflineAction',
+        'container_id': 'containerId',
+        'created_at': 'createdAt',
+    },
+}
+
+# Fields stored as UTC epoch seconds but sent as ISO timestamps
+_EPOCH_FIELDS: Dict[type, frozenset] = {
+    Container: frozenset({'due_date'}),
+}
+
+WIRE_TYPES = frozenset(_SNAKE_TO_CAMEL)
+
+
+@lru_cache(maxsize=None)
+def _wire_names(cls: type) -> Tuple[Tuple[str, str], ...]:
+    """(field name, wire name) pairs for every field of a model"""
+    renames = _SNAKE_TO_CAMEL[cls]
+    return tuple((name, renames.get(name, name)) for name in field_names(cls))
+
+
+@lru_cache(maxsize=None)
+def _field_for_key(cls: type) -> Dict[str, str]:
+    """Accepted payload key -> field name; both wire and field names are accepted"""
+    names = {name: name for name in field_names(cls)}
+    names.update((camel, snake) for snake, camel in _SNAKE_TO_CAMEL[cls].items())
+    return names
+
+
+@lru_cache(maxsize=None)
+def _datetime_fields(cls: type) -> frozenset:
+    return frozenset(name for name, hint in cls.__annotations__.items() if 'datetime' in str(hint))
+
+
+def to_wire(obj: Any) -> Dict[str, Any]:
+    """Model as a dict keyed by the server's camelCase names"""
+    cls = type(obj)
+    data = {wire: getattr(obj, name) for name, wire in _wire_names(cls)}
+    for name in _EPOCH_FIELDS.get(cls, ()):
+        wire = _SNAKE_TO_CAMEL[cls].get(name, name)
+        if data[wire] is not None:
+            data[wire] = from_epoch(data[wire])
+    return data
+
+
+def from_wire(cls: Type[T], data: Mapping[str, Any]) -> T:
+    """Build a model from a server payload, parsing ISO timestamp strings; unknown keys are ignored"""
+    names = _field_for_key(cls)
+    timestamps = _datetime_fields(cls)
+    epochs = _EPOCH_FIELDS.get(cls, frozenset())
+    values = {}
+    for key, value in data.items():
+        name = names.get(key)
+        if name is None:
+            continue
+        if isinstance(value, str) and (name in timestamps or name in epochs):
+            value = parse_utc(value.replace('Z', '+00:00'))
+        if name in epochs and isinstance(value, datetime):
+            value = to_epoch(value)
+        values[name] = value
+    return cls(**values)
@@ -2,17 +2,38 @@
 Simple API service for periodic healthcheck and sync operations
 """
 
+import hashlib
+import itertools
 import logging
+import math
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
 from datetime import datetime, timezone, timedelta
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Iterator, Tuple
 
-from .client import APIClient
-from ..database.models import DeviceStatus, DeviceStatusUpdate, Container, AuditLog, ContainerCreate
+from .client import APIClient, _dumps
+from ..audit.logger import flush_audit_logs
+from ..database.models import DeviceStatus, DeviceStatusUpdate, to_epoch
 
 logger = logging.getLogger(__name__)
 
 
+def _fmt_ts(dt: datetime) -> str:
+    """Format timestamp as required by server: YYYY-MM-DD HH:MM:SS.mmm+00"""
+    return (f"{dt.year:04d}-{dt.month:02d}-{dt.day:02d} "
+            f"{dt.hour:02d}:{dt.minute:02d}:{dt.second:02d}.{dt.microsecond // 1000:03d}+00")
+
+
+def _peek(items: Iterator[Any]) -> Tuple[Any, Iterator[Any]]:
+    """Return the first item (or None) and an iterator that still yields it."""
+    first = next(items, None)
+    if first is None:
+        return None, items
+    return first, itertools.chain((first,), items)
+
+
 class APIService:
     """Simple service for API communication with periodic checks."""
     
@@ -25,11 +46,39 @@ class APIService:
         self.healthcheck_interval = int(self.config.get('HEALTHCHECK_INTERVAL', 300))  # 5 min default
         self.sync_interval = int(self.config.get('SYNC_INTERVAL', 600))  # 10 min default
         
-        # Track last execution times
-        self._last_healthcheck = 0
-        self._last_sync = 0
+        # Track last execution times on the monotonic clock; -inf makes the first check due
+        self._last_healthcheck = -math.inf
+        self._last_sync = -math.inf
         self._last_sync_at = None
-        self._initial_sync_done = False
+        
+        # Wall-clock time shared by everything that runs in one tick
+        self._tick_now = datetime.now(timezone.utc)
+        
+        # Last time a sync actually reached the server; idle syncs are skipped until
+        # RECONCILE_INTERVAL has passed so server-side container changes still arrive
+        self._last_server_sync_at: Optional[datetime] = None
+        self.RECONCILE_INTERVAL = timedelta(hours=1)
+        
+        # Digest of the last container list applied from the server
+        self._containers_digest: Optional[bytes] = None
+        
+        # Initial sync runs once in the background: pending -> running -> done
+        self._initial_sync_state = 'pending'
+        self._initial_sync_complete = threading.Event()
+        
+        # Healthcheck runs on a worker when it is due in the same tick as sync;
+        # the locks keep force_* calls from racing the scheduler
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="api-healthcheck")
+        self._healthcheck_lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        
+        # Device status cached for one tick; updates are merged and written once
+        self._status_lock = threading.RLock()
+        self._status_cache: Optional[DeviceStatus] = None
+        self._pending_update: Dict[str, Any] = {}
+        
+        # Status callbacks run on their own worker so slow handlers don't delay the schedule
+        self._callback_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="api-cb")
         
         # Device status callback
         self._device_status_callback = None
@@ -38,31 +87,101 @@ class APIService:
         # Secure mode tracking
         self._secure_mode_callback = None
         self._last_secure_mode_status = None
+        self._cached_last_seen: Optional[datetime] = None
         self.SECURE_MODE_THRESHOLD = timedelta(days=2)  # 2 days without server connection
+        self.SECURE_MODE_MARGIN = timedelta(minutes=5)  # re-check the database this close to the threshold
         
         logger.info(f"API service initialized - Health: {self.healthcheck_interval}s, Sync: {self.sync_interval}s")
     
     def check_and_run(self):
         """Check if any API operations need to run and execute them."""
-        current_time = time.time()
+        current_time = time.monotonic()
+        self._tick_now = datetime.now(timezone.utc)
         
-        # Do initial sync first
-        if not self._initial_sync_done:
-            self._do_initial_sync()
-            self._initial_sync_done = True
-            # Prevent immediate regular sync after initial sync
-            self._last_sync = current_time
+        # Start initial sync in the background so healthchecks are not held up
+        if self._initial_sync_state == 'pending':
+            self._initial_sync_state = 'running'
+            threading.Thread(
+                target=self._run_initial_sync,
+                daemon=True,
+                name="APIInitialSync"
+            ).start()
         
-        # Check if healthcheck is due
-        if current_time - self._last_healthcheck >= self.healthcheck_interval:
+        healthcheck_due = current_time - self._last_healthcheck >= self.healthcheck_interval
+        # Regular sync stays gated until the initial sync has finished
+        sync_due = (self._initial_sync_complete.is_set() and
+                    current_time - self._last_sync >= self.sync_interval)
+        
+        try:
+            # Overlap the two round trips when both are due in the same tick
+            healthcheck_future = None
+            if healthcheck_due and sync_due:
+                healthcheck_future = self._executor.submit(self._run_healthcheck, current_time)
+            elif healthcheck_due:
+                self._run_healthcheck(current_time)
+            
+            if sync_due:
+                self._run_sync(current_time)
+            
+            if healthcheck_future:
+                healthcheck_future.result()
+        finally:
+            self._flush_status_update()
+    
+    def _get_status_cached(self) -> Optional[DeviceStatus]:
+        """Get device status for the current tick, reading the database once."""
+        with self._status_lock:
+            if self._status_cache is None:
+                self._status_cache = self.db.device_status.get_status()
+            return self._status_cache
+    
+    def _queue_status_update(self, **fields) -> None:
+        """Queue device status changes to be written at the end of the tick."""
+        with self._status_lock:
+            self._pending_update.update(fields)
+            if self._status_cache is not None:
+                self._status_cache = replace(self._status_cache, **fields)
+    
+    def record_seen_time(self) -> None:
+        """Queue a last-seen update, written together with the next tick's status changes."""
+        self._queue_status_update(last_seen_at=datetime.now(timezone.utc))
+    
+    def _flush_status_update(self) -> None:
+        """Write queued device status changes in one update and drop the cache."""
+        with self._status_lock:
+            pending = self._pending_update
+            self._pending_update = {}
+            self._status_cache = None
+            if not pending:
+                return
+            try:
+                self.db.device_status.update_status(DeviceStatusUpdate(**pending))
+            except Exception as e:
+                logger.error(f"Failed to write device status: {e}")
+    
+    def _run_initial_sync(self):
+        """Run the initial sync and open the gate for regular syncs."""
+        try:
+            with self._sync_lock:
+                self._do_initial_sync()
+                # Prevent immediate regular sync after initial sync
+                self._last_sync = time.monotonic()
+        finally:
+            self._initial_sync_state = 'done'
+            self._initial_sync_complete.set()
+    
+    def _run_healthcheck(self, current_time: float):
+        """Run a scheduled healthcheck and record when it ran."""
+        with self._healthcheck_lock:
             try:
                 self._do_healthcheck()
                 self._last_healthcheck = current_time
             except Exception as e:
                 logger.error(f"Healthcheck error: {e}")
-        
-        # Check if sync is due
-        if current_time - self._last_sync >= self.sync_interval:
+    
+    def _run_sync(self, current_time: float):
+        """Run a scheduled sync and record when it ran."""
+        with self._sync_lock:
             try:
                 self._do_sync()
                 self._last_sync = current_time
@@ -74,16 +193,18 @@ class APIService:
         logger.debug("Sending healthcheck")
         
         # Get device status
-        device_status = self.db.device_status.get_status()
+        device_status = self._get_status_cached()
         if not device_status:
             # Create default status
             version = self.config.get('APP_VERSION', '1.0.0')
             update = DeviceStatusUpdate(
                 version=version,
                 update_failures=0,
-                last_seen_at=datetime.now(timezone.utc)
+                last_seen_at=self._tick_now
             )
             device_status = self.db.device_status.update_status(update)
+            with self._status_lock:
+                self._status_cache = device_status
         
         # Send healthcheck
         try:
@@ -101,9 +222,10 @@ class APIService:
                 
                 # Update device status with server response - successful connection resets secure mode
                 update_fields = {
-                    'last_seen_at': datetime.now(timezone.utc),
+                    'last_seen_at': self._tick_now,
                     'is_in_safe_mode': False  # Reset secure mode on successful connection
                 }
+                self._cached_last_seen = self._tick_now
                 
                 if active is not None:
                     active_bool = bool(active)
@@ -113,15 +235,13 @@ class APIService:
                     # Check if status changed and trigger callback
                     if self._last_active_status is not None and self._last_active_status != active_bool:
                         if self._device_status_callback:
-                            try:
-                                self._device_status_callback(active_bool)
-                            except Exception as e:
-                                logger.error(f"Error in device status callback: {e}")
+                            self._callback_pool.submit(
+                                self._run_callback, self._device_status_callback, active_bool, "device status"
+                            )
                     
                     self._last_active_status = active_bool
                 
-                update = DeviceStatusUpdate(**update_fields)
-                self.db.device_status.update_status(update)
+                self._queue_status_update(**update_fields)
             else:
                 logger.warning(f"Healthcheck failed: {response}")
                 
@@ -129,32 +249,34 @@ class APIService:
             logger.error(f"Healthcheck request failed: {e}")
             # Increment failure count
             if device_status:
-                update = DeviceStatusUpdate(update_failures=device_status.update_failures + 1)
-                self.db.device_status.update_status(update)
+                self._queue_status_update(update_failures=device_status.update_failures + 1)
         
         # Check secure mode status after healthcheck (regardless of success/failure)
         self._check_secure_mode()
     
     def _do_initial_sync(self):
-        """Do initial sync on startup - delete local data and get fresh data from server."""
-        logger.info("Performing initial sync - deleting local data and fetching from server")
+        """Do initial sync on startup - delete local logs and replace containers with the server's."""
+        logger.info("Performing initial sync - deleting local logs and fetching containers from server")
         
         try:
-            # Delete all local audit logs and containers first
+            # Containers stay in place while the request is in flight, so returns keep
+            # validating; the response replaces them in one transaction below
             self.db.audit_logs.delete_all()
-            self.db.containers.delete_all()
-            logger.info("Deleted all local containers and audit logs")
+            logger.info("Deleted all local audit logs")
             
             # Send empty data to server but get latest containers back
+            sync_time = datetime.now(timezone.utc)
             response = self.client.sync(logs=[], containers=[])
             
             if response.get('success'):
                 # Update containers from server response  
                 containers_response = response.get('data', [])
-                self._update_containers(containers_response)
+                self._update_containers(containers_response, sync_time)
+                self._containers_digest = self._digest_containers(containers_response)
                 
                 # Update last sync time
-                self._last_sync_at = datetime.now(timezone.utc)
+                self._last_sync_at = sync_time
+                self._last_server_sync_at = self._last_sync_at
                 update = DeviceStatusUpdate(last_sync_at=self._last_sync_at)
                 self.db.device_status.update_status(update)
                 
@@ -170,7 +292,7 @@ class APIService:
         logger.debug("Performing sync")
         
         # Get last sync time from database (before updating it)
-        device_status = self.db.device_status.get_status()
+        device_status = self._get_status_cached()
         if device_status:
             # Device status exists - always use lastSyncAt (even on restart)
             old_last_sync_at = device_status.last_sync_at
@@ -181,103 +303,128 @@ class APIService:
             old_last_sync_at = datetime.fromtimestamp(0, tz=timezone.utc)
             logger.info("No device status found - fetching all existing audit logs (first run)")
         
-        # Capture sync time after determining old sync time but before getting data
+        # Sync time is captured at the start of the tick, before getting data
         # This ensures no logs created during sync are missed
-        new_sync_time = datetime.now(timezone.utc)
+        new_sync_time = self._tick_now
         
-        # Get data to sync - only containers/logs updated since last sync
-        containers = self.db.containers.get_since(old_last_sync_at)
-        logs = self.db.audit_logs.get_logs_since(old_last_sync_at)
+        # Buffered audit entries stamped before the sync time must be in the database
+        # before reading, or the next sync (which starts from this time) would skip them
+        flush_audit_logs()
         
-        containers_data = [self._container_to_dict(c) for c in containers]
-        # Filter out logs with None container_id (system logs, etc.)
-        filtered_logs = [log for log in logs if log.container_id is not None]
-        logs_data = [self._log_to_dict(log) for log in filtered_logs]
+        # Get data to sync - only containers/logs updated since last sync. Rows go straight
+        # to API dicts as they are read; sent log ids are deleted after a successful sync.
+        # System logs without a container are filtered out in SQL.
+        sent_log_ids: List[str] = []
+        sent_containers = 0
         
-        logger.debug(f"Syncing {len(containers_data)} containers and {len(logs_data)} logs since {old_last_sync_at}")
+        def containers_data():
+            nonlocal sent_containers
+            for row in self.db.containers.iter_sync_rows_since(old_last_sync_at):
+                sent_containers += 1
+                yield self._container_to_dict(row)
+        
+        def logs_data():
+            for row in self.db.audit_logs.iter_sync_rows_since(old_last_sync_at):
+                sent_log_ids.append(row["id"])
+                yield self._log_to_dict(row)
+        
+        first_container, containers_iter = _peek(containers_data())
+        first_log, logs_iter = _peek(logs_data())
+        
+        # Nothing pending locally: skip the round trip unless it's time to reconcile with the server
+        if (first_container is None and first_log is None and self._last_server_sync_at is not None and
+                new_sync_time - self._last_server_sync_at < self.RECONCILE_INTERVAL):
+            self._queue_status_update(last_sync_at=new_sync_time)
+            logger.debug("Nothing to sync - skipping server round trip")
+            return
+        
+        logger.debug(f"Syncing containers and logs since {old_last_sync_at}")
         
         try:
-            response = self.client.sync(logs=logs_data, containers=containers_data)
+            response = self.client.sync_stream(logs=logs_iter, containers=containers_iter)
             
             if response.get('success'):
-                # Delete synced logs first (before updating containers)
-                for log in logs:
-                    self.db.audit_logs.delete_log(log.id)
+                # Delete synced logs first (before updating containers), along with
+                # system logs that are never sent
+                self.db.audit_logs.delete_many(sent_log_ids)
+                self.db.audit_logs.delete_unsyncable_before(new_sync_time)
                 
-                # Update containers from server response
+                # Update containers from server response, unless it matches what was last applied
+                # and nothing local was pushed that could have diverged from it
                 containers_response = response.get('data', [])
-                self._update_containers(containers_response)
+                digest = self._digest_containers(containers_response)
+                if sent_containers or digest != self._containers_digest:
+                    self._update_containers(containers_response, new_sync_time)
+                    self._containers_digest = digest
+                else:
+                    logger.debug("Server containers unchanged - skipping local update")
                 
                 # Update last sync time in device status (use captured time)
-                update = DeviceStatusUpdate(last_sync_at=new_sync_time)
-                self.db.device_status.update_status(update)
+                self._queue_status_update(last_sync_at=new_sync_time)
+                self._last_server_sync_at = new_sync_time
                 
-                logger.info(f"Sync complete - sent {len(containers_data)} containers, {len(logs_data)} logs")
+                logger.info(f"Sync complete - sent {sent_containers} containers, {len(sent_log_ids)} logs")
             else:
                 logger.warning(f"Sync failed: {response}")
                 
         except Exception as e:
             logger.error(f"Sync request failed: {e}")
     
-    def _container_to_dict(self, container: Container) -> Dict[str, Any]:
-        """Convert container to dict for API."""
-        # Format timestamp as required by server: YYYY-MM-DD HH:MM:SS.mmm+00
-        formatted_timestamp = container.updated_at.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3] + '+00'
+    def _container_to_dict(self, row) -> Dict[str, Any]:
+        """Convert container row to dict for API."""
         return {
-            "id": container.id,
-            "isReturnable": container.is_returnable,
-            "updatedAt": formatted_timestamp
+            "id": row["id"],
+            "isReturnable": bool(row["isReturnable"]),
+            "updatedAt": _fmt_ts(datetime.fromisoformat(row["updatedAt"]))
         }
     
-    def _log_to_dict(self, log: AuditLog) -> Dict[str, Any]:
-        """Convert audit log to dict for API."""
-        # Format timestamp as required by server: YYYY-MM-DD HH:MM:SS.mmm+00
-        formatted_timestamp = log.created_at.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3] + '+00'
+    def _log_to_dict(self, row) -> Dict[str, Any]:
+        """Convert audit log row to dict for API."""
         return {
-            "type": log.type.value,
-            "description": log.description,
-            "isOfflineAction": log.is_offline_action,
-            "containerId": log.container_id,
-            "createdAt": formatted_timestamp
+            "type": row["type"],
+            "description": row["description"],
+            "isOfflineAction": bool(row["isOfflineAction"]),
+            "containerId": row["containerId"],
+            "createdAt": _fmt_ts(datetime.fromisoformat(row["createdAt"]))
         }
     
-    def _update_containers(self, containers_data: List[Dict[str, Any]]):
-        """Replace all containers with server data."""
+    def _digest_containers(self, containers_data: List[Dict[str, Any]]) -> bytes:
+        """Hash a server container list to detect unchanged responses."""
+        return hashlib.blake2b(_dumps(containers_data), digest_size=16).digest()
+    
+    def _update_containers(self, containers_data: List[Dict[str, Any]], sync_time: datetime):
+        """Replace all containers with server data.
+        
+        Rows are stamped with the sync time so server-applied changes are not
+        picked up as local changes and echoed back on the next sync.
+        """
         try:
-            # Clear existing containers
-            self.db.containers.delete_all()
-            logger.debug("Cleared all existing containers")
+            rows = [
+                (c.get('id'), c.get('qrCode', ''), c.get('isReturnable', True), self._parse_due_time(c))
+                for c in containers_data
+            ]
+            rows = [row for row in rows if row[0] and row[1]]
             
-            # Insert all new containers from server
-            for container_data in containers_data:
-                container_id = container_data.get('id')
-                qr_code = container_data.get('qrCode', '')
-                is_returnable = container_data.get('isReturnable', True)
-                
-                # Parse due date from DateTime field
-                due_date = None
-                if 'dueTime' in container_data:
-                    try:
-                        due_date = datetime.fromisoformat(
-                            container_data['dueTime'].replace('Z', '+00:00')
-                        )
-                    except ValueError:
-                        logger.warning(f"Invalid dueTime format for container {container_id}")
-                
-                if container_id and qr_code:
-                    container_create = ContainerCreate(
-                        qr_code=qr_code,
-                        is_returnable=is_returnable,
-                        due_date=due_date
-                    )
-                    self.db.containers.create_with_id(container_id, container_create)
+            # Upsert changed rows and drop containers the server no longer knows about
+            written = self.db.containers.upsert_many(rows, delete_missing=True, updated_at=sync_time)
             
-            logger.info(f"Replaced containers with {len(containers_data)} new records from server")
+            logger.info(f"Replaced containers with {len(containers_data)} records from server ({written} changed)")
             
         except Exception as e:
             logger.error(f"Failed to replace containers: {e}")
             raise
     
+    def _parse_due_time(self, container_data: Dict[str, Any]) -> Optional[int]:
+        """Parse the dueTime field of a server container, if present, to UTC epoch seconds."""
+        due_time = container_data.get('dueTime')
+        if not due_time:
+            return None
+        try:
+            return to_epoch(datetime.fromisoformat(due_time.replace('Z', '+00:00')))
+        except ValueError:
+            logger.warning(f"Invalid dueTime format for container {container_data.get('id')}")
+            return None
+    
     def validate_container(self, container_id: str) -> Optional[Dict[str, Any]]:
         """Validate container with server."""
         try:
@@ -292,14 +439,37 @@ class APIService:
     def force_sync(self):
         """Force an immediate sync (useful for testing)."""
         logger.info("Forcing immediate sync")
-        self._do_sync()
-        self._last_sync = time.time()
+        self._tick_now = datetime.now(timezone.utc)
+        try:
+            with self._sync_lock:
+                self._do_sync()
+                self._last_sync = time.monotonic()
+        finally:
+            self._flush_status_update()
     
     def force_healthcheck(self):
         """Force an immediate healthcheck (useful for testing)."""
         logger.info("Forcing immediate healthcheck")  
-        self._do_healthcheck()
-        self._last_healthcheck = time.time()
+        self._tick_now = datetime.now(timezone.utc)
+        try:
+            with self._healthcheck_lock:
+                self._do_healthcheck()
+                self._last_healthcheck = time.monotonic()
+        finally:
+            self._flush_status_update()
+    
+    def close(self):
+        """Release API client resources."""
+        self._executor.shutdown(wait=True)
+        self._callback_pool.shutdown(wait=False)
+        self.client.close()
+    
+    def _run_callback(self, callback, value: bool, name: str):
+        """Invoke a status callback on the callback worker."""
+        try:
+            callback(value)
+        except Exception as e:
+            logger.error(f"Error in {name} callback: {e}")
     
     def set_device_status_callback(self, callback):
         """Set callback function to be called when device active status changes.
@@ -321,22 +491,22 @@ class APIService:
     
     def _check_secure_mode(self):
         """Check if device should be in secure mode based on server connectivity."""
+        # Nothing can change while the server was seen recently and secure mode is already off
+        if (self._last_secure_mode_status is False and self._cached_last_seen is not None and
+                self._tick_now - self._cached_last_seen < self.SECURE_MODE_THRESHOLD - self.SECURE_MODE_MARGIN):
+            return
+        
         try:
             # Get device status to check last successful server communication
-            device_status = self.db.device_status.get_status()
+            device_status = self._get_status_cached()
             if not device_status:
                 # No device status means we've never connected - don't enter secure mode
                 should_be_secure = False
                 logger.debug("No device status found - never connected to server, secure mode not activated")
             else:
-                # Check if last_seen_at is older than 2 days
-                now = datetime.now(timezone.utc)
-                last_seen = device_status.last_seen_at
-                if last_seen.tzinfo is None:
-                    # Database returns timezone-naive datetime, assume UTC
-                    last_seen = last_seen.replace(tzinfo=timezone.utc)
-                
-                time_since_last_seen = now - last_seen
+                # Check if last_seen_at is older than 2 days (stored timestamps are always UTC-aware)
+                self._cached_last_seen = device_status.last_seen_at
+                time_since_last_seen = self._tick_now - self._cached_last_seen
                 should_be_secure = time_since_last_seen > self.SECURE_MODE_THRESHOLD
                 
                 if should_be_secure:
@@ -347,17 +517,15 @@ class APIService:
             # Update database secure mode status if changed
             current_secure_status = device_status.is_in_safe_mode if device_status else False
             if current_secure_status != should_be_secure:
-                update = DeviceStatusUpdate(is_in_safe_mode=should_be_secure)
-                self.db.device_status.update_status(update)
+                self._queue_status_update(is_in_safe_mode=should_be_secure)
                 logger.info(f"Updated secure mode status in database: {should_be_secure}")
             
             # Trigger callback if status changed
             if self._last_secure_mode_status is not None and self._last_secure_mode_status != should_be_secure:
                 if self._secure_mode_callback:
-                    try:
-                        self._secure_mode_callback(should_be_secure)
-                    except Exception as e:
-                        logger.error(f"Error in secure mode callback: {e}")
+                    self._callback_pool.submit(
+                        self._run_callback, self._secure_mode_callback, should_be_secure, "secure mode"
+                    )
             
             self._last_secure_mode_status = should_be_secure
             
@@ -2,166 +2,455 @@
 Audit logging system for the Container Return System
 """
 
+import atexit
+import itertools
 import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
 from datetime import datetime
-from typing import Optional
+from typing import TYPE_CHECKING, Optional, List, Tuple
 
-from ..database.connection import DatabaseConnection, get_database
-from ..database.models import LogType, AuditLogCreate
-from ..database.crud import AuditLogCRUD
+from ..database.models import LogType, from_epoch
 from ..config.config_manager import get_config
 
+if TYPE_CHECKING:
+    from ..database.connection import DatabaseConnection
 
-class AuditLogger:
-    """Audit logger with database backend"""
+_AUDIT_LOGGER = logging.getLogger("audit")
+
+# Application log level and message template for each audit entry type
+_LEVEL_FOR_TYPE = {t: (logging.ERROR if t == LogType.ERROR else logging.INFO) for t in LogType}
+# Plain-dict lookup instead of the enum's .value descriptor on every entry
+_TYPE_STR = {t: t.value for t in LogType}
+_MSG_TMPL = "[%s] %s (Container: %s, Offline: %s)"
+
+# Distinct recent entries tracked for duplicate suppression
+COALESCE_MAX_KEYS = 256
+
+# (millisecond tick, timestamp) shared by every entry logged within that millisecond
+_clock: Tuple[int, datetime] = (-1, datetime.min)
+
+
+def _utcnow() -> datetime:
+    """datetime.utcnow(), refreshed at most once per millisecond"""
+    global _clock
+    tick = time.monotonic_ns() // 1_000_000
+    cached = _clock
+    if cached[0] != tick:
+        cached = _clock = (tick, datetime.utcnow())
+    return cached[1]
+
+
+@lru_cache(maxsize=256)
+def _isoformat(value: datetime) -> str:
+    """Format an entry timestamp once for all rows that share it"""
+    return value.isoformat()
+
+class _Details(tuple):
+    """Security event details frozen as (key, value) pairs.
+    
+    Hashable, so repeated identical events coalesce like any other entry, and
+    formatted exactly as the original dict when the description is rendered.
+    """
+    
+    __slots__ = ()
     
-    def __init__(self, db: Optional[DatabaseConnection] = None):
-        self.logger = logging.getLogger("audit")
+    def __str__(self) -> str:
+        return "{" + ", ".join(f"{key!r}: {value!r}" for key, value in self) + "}"
+    
+    __repr__ = __str__
+
+
+@dataclass(slots=True)
+class _AuditRow:
+    """Queued audit entry; a plain struct, validated by the fixed call sites rather than per entry"""
+    seq: int
+    type: LogType
+    description: str
+    container_id: Optional[str]
+    is_offline: bool
+    created_at: datetime
+    args: tuple = ()
+    
+    def text(self) -> str:
+        """Description with %-style args applied"""
+        return self.description % self.args if self.args else self.description
+    
+    def to_params(self) -> Tuple[None, str, str, bool, Optional[str], str]:
+        """Row parameters for AuditLogCRUD.insert_rows; the database assigns the id"""
+        return (None, _TYPE_STR[self.type], self.text(), self.is_offline,
+                self.container_id, _isoformat(self.created_at))
+
+
+class AuditLogger:
+    """Audit logger with database backend.
+    
+    Entries are stored in a preallocated ring buffer and written in batches by
+    a background flusher thread, so logging never waits on a database
+    transaction or a lock. Producers claim a slot with an atomic fetch-add
+    (next() on itertools.count is atomic under the GIL) and store one _AuditRow;
+    empty slots hold None so the consumer can tell a claimed-but-unwritten
+    slot from a written one.
+    
+    When the ring is full, AUDIT_QUEUE_POLICY decides what happens: block
+    (the default) waits up to AUDIT_BLOCK_TIMEOUT_MS for the flusher before
+    discarding the new entry, drop_oldest overwrites the oldest pending entry,
+    and drop_newest discards the new one. The drop policies can lose return
+    records, so they are opt-in.
+    
+    Descriptions take %-style args like the logging module; they are only
+    formatted when the entry is persisted (on the flusher thread) or the
+    application log level is enabled. Types not listed in AUDIT_PERSIST_TYPES
+    skip the database entirely.
+    
+    Identical entries repeated within AUDIT_COALESCE_WINDOW_MS (a stuck
+    scanner or UART error loop) are suppressed after the first one and
+    reported once as "... (repeated N times)" when the window closes.
+    """
+    
+    QUEUE_POLICIES = ('block', 'drop_oldest', 'drop_newest')
+    
+    def __init__(self, db: Optional['DatabaseConnection'] = None):
+        # Imported here so loading this module does not pull in the database layer
+        from ..database.connection import get_database
+        from ..database.crud import AuditLogCRUD
+        
+        self.logger = _AUDIT_LOGGER
         
+        settings = get_config()
         if db is None:
-            settings = get_config()
             db = get_database(settings.database_url)
         
         self.db = db
         self.audit_crud = AuditLogCRUD(db)
+        
+        # Ring buffer (power-of-two size) drained by the flusher once a batch fills or the interval elapses
+        ring_size = 1 << max(settings.audit_buffer_size - 1, 1).bit_length()
+        self._ring: List[Optional[_AuditRow]] = [None] * ring_size
+        self._ring_size = ring_size
+        self._mask = ring_size - 1
+        self._pos = itertools.count()
+        self._consumer_pos = 0
+        self._batch_size = settings.audit_batch_size
+        self._flush_interval = settings.audit_flush_interval_ms / 1000
+        self._wake = threading.Event()
+        self._flush_lock = threading.Lock()  # single consumer: flusher thread or flush()
+        self._stopping = False
+        
+        # Full-ring handling; discarded sequence numbers are skipped by the consumer
+        self._policy = settings.audit_queue_policy
+        if self._policy not in self.QUEUE_POLICIES:
+            self.logger.warning("Unknown audit queue policy '%s' - using block", self._policy)
+            self._policy = 'block'
+        self._block_timeout = settings.audit_block_timeout_ms / 1000
+        self._space = threading.Condition()
+        self._skipped: set = set()
+        
+        self._persist_types = set()
+        for name in settings.audit_persist_types:
+            try:
+                self._persist_types.add(LogType(name))
+            except ValueError:
+                self.logger.warning("Ignoring unknown audit persist type '%s'", name)
+        
+        # Duplicate suppression: entry key -> [suppressed count, window start], oldest first
+        self._coalesce_window = settings.audit_coalesce_window_ms / 1000
+        self._recent: OrderedDict = OrderedDict()
+        self._recent_lock = threading.Lock()
+        
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True, name="AuditFlusher")
+        self._flusher.start()
+        atexit.register(self.close)
+    
+    def _should_persist(self, log_type: LogType) -> bool:
+        """Whether entries of this type are written to the database"""
+        return log_type in self._persist_types
     
     def _log_to_database(self, log_type: LogType, description: str, 
                         container_id: Optional[str] = None, 
-                        is_offline: bool = False) -> None:
-        """Log audit entry to database"""
+                        is_offline: bool = False, args: tuple = ()) -> None:
+        """Queue audit entry for the database"""
+        if log_type not in self._persist_types and not self.logger.isEnabledFor(_LEVEL_FOR_TYPE[log_type]):
+            return  # going nowhere: skip coalescing and keep the args unformatted
+        if self._coalesce_window and self._coalesce((log_type, description, container_id, is_offline, args)):
+            return
+        self._emit(log_type, description, container_id, is_offline, args)
+    
+    def _emit(self, log_type: LogType, description: str, container_id: Optional[str],
+              is_offline: bool, args: tuple) -> None:
+        """Store an entry in the ring and write it to the application log"""
+        if self._should_persist(log_type):
+            seq = next(self._pos)
+            if seq - self._consumer_pos >= self._ring_size and not self._make_room(seq):
+                self._skipped.add(seq)
+            else:
+                self._ring[seq & self._mask] = _AuditRow(
+                    seq, log_type, description, container_id, is_offline, _utcnow(), args
+                )
+            if (seq + 1) % self._batch_size == 0:
+                self._wake.set()
+        
+        # Also log to application logger for immediate visibility
+        level = _LEVEL_FOR_TYPE[log_type]
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, _MSG_TMPL, _TYPE_STR[log_type], description % args if args else description,
+                            container_id or 'N/A', is_offline)
+    
+    def _coalesce(self, key: tuple) -> bool:
+        """Track an entry; return True if it duplicates one still inside the window"""
+        now = time.monotonic()
+        summaries = []
+        with self._recent_lock:
+            try:
+                state = self._recent.get(key)
+            except TypeError:
+                return False  # unhashable args (e.g. nested details values) are never coalesced
+            if state is not None and now - state[1] < self._coalesce_window:
+                state[0] += 1
+                return True
+            if state is not None:
+                summaries.append((key, state[0]))
+                del self._recent[key]
+            self._recent[key] = [0, now]
+            if len(self._recent) > COALESCE_MAX_KEYS:
+                old_key, old_state = self._recent.popitem(last=False)
+                summaries.append((old_key, old_state[0]))
+        for old_key, count in summaries:
+            self._emit_repeated(old_key, count)
+        return False
+    
+    def _flush_coalesced(self, force: bool = False) -> None:
+        """Report duplicates whose window has closed (all of them if force)"""
+        if not self._recent:
+            return
+        cutoff = time.monotonic() - self._coalesce_window
+        summaries = []
+        with self._recent_lock:
+            # Ordered by window start, so stop at the first window still open
+            while self._recent:
+                key, state = next(iter(self._recent.items()))
+                if not force and state[1] > cutoff:
+                    break
+                del self._recent[key]
+                summaries.append((key, state[0]))
+        for key, count in summaries:
+            self._emit_repeated(key, count)
+    
+    def _emit_repeated(self, key: tuple, count: int) -> None:
+        """Emit the summary entry for count suppressed duplicates of key"""
+        if not count:
+            return
+        log_type, description, container_id, is_offline, args = key
+        if not args:
+            description = description.replace('%', '%%')
+        self._emit(log_type, description + " (repeated %d times)", container_id, is_offline, args + (count,))
+    
+    def _make_room(self, seq: int) -> bool:
+        """Apply the full-ring policy; return False if the entry must be discarded"""
+        if self._policy == 'drop_oldest':
+            return True  # overwrite; the consumer notices the lap and counts the loss
+        if self._policy == 'block':
+            self._wake.set()
+            with self._space:
+                return self._space.wait_for(
+                    lambda: seq - self._consumer_pos < self._ring_size or self._stopping,
+                    timeout=self._block_timeout
+                ) and not self._stopping
+        return False
+    
+    def _flush_loop(self) -> None:
+        """Background thread writing queued entries in batches"""
+        while not self._stopping:
+            # Woken early when producers fill a batch, otherwise flush every interval
+            self._wake.wait(self._flush_interval)
+            self._wake.clear()
+            self.flush()
+            # Summaries land in the just-drained ring and are written on the next pass
+            self._flush_coalesced()
+    
+    def flush(self) -> None:
+        """Write all queued entries to the database now"""
+        with self._flush_lock:
+            while True:
+                batch = self._drain(self._batch_size)
+                if not batch:
+                    return
+                self._write_batch(batch)
+    
+    def _drain(self, limit: int) -> List[_AuditRow]:
+        """Take up to limit written entries from the ring, in order"""
+        batch = []
+        dropped = 0
+        pos = self._consumer_pos
+        ring = self._ring
+        mask = self._mask
+        
+        while len(batch) < limit:
+            if pos in self._skipped:
+                # Discarded by the full-ring policy
+                self._skipped.discard(pos)
+                dropped += 1
+                pos += 1
+                continue
+            slot = pos & mask
+            entry = ring[slot]
+            if entry is None:
+                break  # not written yet
+            seq = entry.seq
+            if seq < pos:
+                break  # stale entry from an earlier lap that was already consumed
+            if seq > pos:
+                # Producers lapped the consumer and overwrote the oldest entries; step
+                # towards the oldest surviving one (at most one ring length behind seq)
+                dropped += seq - self._mask - pos
+                pos = seq - self._mask
+                continue
+            ring[slot] = None
+            pos += 1
+            batch.append(entry)
+        
+        self._consumer_pos = pos
+        if self._policy == 'block':
+            with self._space:
+                self._space.notify_all()
+        if dropped:
+            self.logger.warning("Audit queue full (%s) - dropped %d entries", self._policy, dropped)
+        return batch
+    
+    def _write_batch(self, batch: List[_AuditRow]) -> None:
+        """Insert a batch in one transaction, falling back to row by row"""
         try:
-            audit_log = AuditLogCreate(
-                type=log_type,
-                description=description,
-                is_offline_action=is_offline,
-                container_id=container_id
-            )
-            
-            self.audit_crud.create_log(audit_log)
-            
-            # Also log to application logger for immediate visibility
-            log_level = logging.ERROR if log_type == LogType.ERROR else logging.INFO
-            self.logger.log(
-                log_level,
-                f"[{log_type.value}] {description} "
-                f"(Container: {container_id or 'N/A'}, Offline: {is_offline})"
-            )
-            
+            self.audit_crud.insert_rows([entry.to_params() for entry in batch])
         except Exception as e:
-            # If database logging fails, at least log to application logger
-            if "FOREIGN KEY constraint failed" in str(e) and container_id:
-                # Try again without container_id if foreign key constraint fails
-                try:
-                    audit_log = AuditLogCreate(
-                        type=log_type,
-                        description=f"{description} (Container ID: {container_id} - not found in DB)",
-                        is_offline_action=is_offline,
-                        container_id=None
-                    )
-                    self.audit_crud.create_log(audit_log)
-                    self.logger.warning(f"Logged audit entry without container reference due to FK constraint")
-                    return
-                except Exception:
-                    pass
+            self.logger.warning("Batch audit write failed, retrying %d entries individually: %s", len(batch), e)
+            for audit_log in batch:
+                self._write_entry(audit_log)
+    
+    def _write_entry(self, audit_log: _AuditRow) -> None:
+        """Insert a single audit entry"""
+        try:
+            self.audit_crud.insert_rows([audit_log.to_params()])
             
-            self.logger.error(f"Failed to log audit entry to database: {e}")
-            self.logger.log(
-                logging.ERROR if log_type == LogType.ERROR else logging.INFO,
-                f"[{log_type.value}] {description} "
-                f"(Container: {container_id or 'N/A'}, Offline: {is_offline})"
-            )
+        except Exception as e:
+            # Unknown container ids are handled by the insert itself, so this is a real failure.
+            # The entry itself was already sent to the application log when queued (if
+            # that level is enabled); keep its text in the error so it is not lost
+            self.logger.error("Failed to log audit entry to database: %s - [%s] %s",
+                              e, _TYPE_STR[audit_log.type], audit_log.text())
+    
+    def close(self) -> None:
+        """Stop the flusher and write any remaining entries"""
+        if self._stopping:
+            return
+        self._flush_coalesced(force=True)
+        self._stopping = True
+        self._wake.set()
+        with self._space:
+            self._space.notify_all()
+        self._flusher.join(timeout=5)
+        self.flush()
     
     def log_return_valid(self, container_id: str, description: str, 
-                        is_offline: bool = False) -> None:
+                        is_offline: bool = False, *, args: tuple = ()) -> None:
         """Log successful container return"""
         self._log_to_database(
             LogType.RETURN_VALID,
             description,
             container_id,
-            is_offline
+            is_offline,
+            args
         )
     
     def log_return_invalid(self, container_id: str, description: str, 
-                          is_offline: bool = False) -> None:
+                          is_offline: bool = False, *, args: tuple = ()) -> None:
         """Log invalid container return attempt"""
         self._log_to_database(
             LogType.RETURN_INVALID,
             description,
             container_id,
-            is_offline
+            is_offline,
+            args
         )
     
     def log_info(self, description: str, container_id: Optional[str] = None, 
-                is_offline: bool = False) -> None:
+                is_offline: bool = False, *, args: tuple = ()) -> None:
         """Log informational audit entry"""
         self._log_to_database(
             LogType.INFO,
             description,
             container_id,
-            is_offline
+            is_offline,
+            args
         )
     
     def log_error(self, description: str, container_id: Optional[str] = None, 
-                 is_offline: bool = False) -> None:
+                 is_offline: bool = False, *, args: tuple = ()) -> None:
         """Log error audit entry"""
         self._log_to_database(
             LogType.ERROR,
             description,
             container_id,
-            is_offline
+            is_offline,
+            args
         )
     
-    # Convenience methods for common audit scenarios
+    # Convenience methods for common audit scenarios. The fixed-format ones call
+    # _log_to_database directly; the template and raw args are queued as-is and
+    # formatted by the flusher only for entries that are actually written
     
     def log_system_startup(self, version: str) -> None:
         """Log system startup"""
-        self.log_info(f"Container Return System started - Version: {version}")
+        self._log_to_database(LogType.INFO, "Container Return System started - Version: %s", None, False, (version,))
     
     def log_system_shutdown(self, reason: str = "Normal shutdown") -> None:
         """Log system shutdown"""
-        self.log_info(f"Container Return System shutdown - Reason: {reason}")
+        self.log_info("Container Return System shutdown - Reason: %s", args=(reason,))
     
     def log_database_init(self) -> None:
         """Log database initialization"""
-        self.log_info("Database initialized successfully")
+        self._log_to_database(LogType.INFO, "Database initialized successfully", None, False, ())
     
     def log_database_error(self, error: str) -> None:
         """Log database error"""
-        self.log_error(f"Database error: {error}")
+        self._log_to_database(LogType.ERROR, "Database error: %s", None, False, (error,))
     
     def log_uart_connection(self, port: str, status: str) -> None:
         """Log UART connection status"""
-        self.log_info(f"UART connection {status} on port {port}")
+        self.log_info("UART connection %s on port %s", args=(status, port))
     
     def log_uart_error(self, error: str) -> None:
         """Log UART communication error"""
-        self.log_error(f"UART communication error: {error}")
+        self._log_to_database(LogType.ERROR, "UART communication error: %s", None, False, (error,))
     
     def log_api_sync_start(self) -> None:
         """Log API sync start"""
-        self.log_info("API synchronization started")
+        self._log_to_database(LogType.INFO, "API synchronization started", None, False, ())
     
     def log_api_sync_success(self, synced_count: int) -> None:
         """Log successful API sync"""
-        self.log_info(f"API synchronization completed - {synced_count} items synced")
+        self._log_to_database(LogType.INFO, "API synchronization completed - %d items synced", None, False, (synced_count,))
     
     def log_api_sync_failure(self, error: str) -> None:
         """Log API sync failure"""
-        self.log_error(f"API synchronization failed: {error}", is_offline=True)
+        self._log_to_database(LogType.ERROR, "API synchronization failed: %s", None, True, (error,))
     
     def log_container_scanned(self, qr_code: str) -> None:
         """Log container QR code scan"""
-        self.log_info(f"Container QR code scanned: {qr_code}")
+        self._log_to_database(LogType.INFO, "Container QR code scanned: %s", None, False, (qr_code,))
     
     def log_qr_scan(self, container_id: str, source: str = "usb") -> None:
         """Log QR scan event"""
-        self.log_info(f"QR code scanned from {source}", container_id)
+        self.log_info("QR code scanned from %s", container_id, args=(source,))
     
     def log_container_validated(self, container_id: str, qr_code: str) -> None:
         """Log container validation success"""
         self.log_return_valid(
             container_id,
-            f"Container validated successfully - QR: {qr_code}"
+            "Container validated successfully - QR: %s",
+            args=(qr_code,)
         )
     
     def log_container_rejected(self, qr_code: str, reason: str, 
@@ -169,91 +458,95 @@ class AuditLogger:
         """Log container rejection"""
         self.log_return_invalid(
             container_id or "unknown",
-            f"Container rejected - QR: {qr_code}, Reason: {reason}"
+            "Container rejected - QR: %s, Reason: %s",
+            args=(qr_code, reason)
         )
     
     def log_container_expired(self, container_id: str, qr_code: str, 
-                            due_date: datetime) -> None:
-        """Log expired container attempt"""
+                            due_date: int) -> None:
+        """Log expired container attempt (due_date in UTC epoch seconds)"""
         self.log_return_invalid(
             container_id,
-            f"Expired container - QR: {qr_code}, Due: {due_date.isoformat()}"
+            "Expired container - QR: %s, Due: %s",
+            args=(qr_code, from_epoch(due_date).isoformat())
         )
     
     def log_container_not_returnable(self, container_id: str, qr_code: str) -> None:
         """Log non-returnable container attempt"""
         self.log_return_invalid(
             container_id,
-            f"Non-returnable container - QR: {qr_code}"
+            "Non-returnable container - QR: %s",
+            args=(qr_code,)
         )
     
     def log_container_not_found(self, qr_code: str) -> None:
         """Log container not found in database"""
         self.log_return_invalid(
             "unknown",
-            f"Container not found in database - QR: {qr_code}"
+            "Container not found in database - QR: %s",
+            args=(qr_code,)
         )
     
     def log_sequence_started(self, sequence_type: str) -> None:
         """Log sequence start"""
-        self.log_info(f"Sequence started: {sequence_type}")
+        self._log_to_database(LogType.INFO, "Sequence started: %s", None, False, (sequence_type,))
     
     def log_sequence_completed(self, sequence_type: str, duration: float) -> None:
         """Log sequence completion"""
-        self.log_info(f"Sequence completed: {sequence_type} ({duration:.2f}s)")
+        self._log_to_database(LogType.INFO, "Sequence completed: %s (%.2fs)", None, False, (sequence_type, duration))
     
     def log_sequence_failed(self, sequence_type: str, error: str) -> None:
         """Log sequence failure"""
-        self.log_error(f"Sequence failed: {sequence_type} - {error}")
+        self._log_to_database(LogType.ERROR, "Sequence failed: %s - %s", None, False, (sequence_type, error))
     
     def log_hardware_status(self, component: str, status: str) -> None:
         """Log hardware component status"""
-        self.log_info(f"Hardware status - {component}: {status}")
+        self._log_to_database(LogType.INFO, "Hardware status - %s: %s", None, False, (component, status))
     
     def log_hardware_error(self, component: str, error: str) -> None:
         """Log hardware error"""
-        self.log_error(f"Hardware error - {component}: {error}")
+        self._log_to_database(LogType.ERROR, "Hardware error - %s: %s", None, False, (component, error))
     
     def log_safe_mode_entered(self, reason: str) -> None:
         """Log safe mode activation"""
-        self.log_error(f"Safe mode activated - Reason: {reason}")
+        self._log_to_database(LogType.ERROR, "Safe mode activated - Reason: %s", None, False, (reason,))
     
     def log_safe_mode_exited(self) -> None:
         """Log safe mode deactivation"""
-        self.log_info("Safe mode deactivated")
+        self._log_to_database(LogType.INFO, "Safe mode deactivated", None, False, ())
     
     def log_device_status_update(self, field: str, old_value: str, new_value: str) -> None:
         """Log device status update"""
-        self.log_info(f"Device status updated - {field}: {old_value} -> {new_value}")
+        self._log_to_database(LogType.INFO, "Device status updated - %s: %s -> %s", None, False, (field, old_value, new_value))
     
     def log_maintenance_mode(self, enabled: bool) -> None:
         """Log maintenance mode change"""
-        status = "enabled" if enabled else "disabled"
-        self.log_info(f"Maintenance mode {status}")
+        self.log_info("Maintenance mode %s", args=("enabled" if enabled else "disabled",))
     
     def log_configuration_change(self, setting: str, old_value: str, new_value: str) -> None:
         """Log configuration change"""
-        self.log_info(f"Configuration changed - {setting}: {old_value} -> {new_value}")
+        self._log_to_database(LogType.INFO, "Configuration changed - %s: %s -> %s", None, False, (setting, old_value, new_value))
     
     def log_offline_mode_entered(self, reason: str) -> None:
         """Log offline mode activation"""
-        self.log_info(f"Offline mode activated - Reason: {reason}", is_offline=True)
+        self._log_to_database(LogType.INFO, "Offline mode activated - Reason: %s", None, True, (reason,))
     
     def log_offline_mode_exited(self) -> None:
         """Log offline mode deactivation"""
-        self.log_info("Offline mode deactivated")
+        self._log_to_database(LogType.INFO, "Offline mode deactivated", None, False, ())
     
     def log_cleanup_completed(self, deleted_count: int) -> None:
         """Log audit log cleanup"""
-        self.log_info(f"Audit log cleanup completed - {deleted_count} entries deleted")
-
+        self._log_to_database(LogType.INFO, "Audit log cleanup completed - %d entries deleted", None, False, (deleted_count,))
+    
     def log_security_event(self, event_type: str, description: str,
                           details: Optional[dict] = None) -> None:
         """Log security-related events (fraud attempts, unauthorized access, etc.)"""
-        detail_str = ""
         if details:
-            detail_str = f" - Details: {details}"
-        self.log_error(f"Security Event [{event_type}]: {description}{detail_str}")
+            self.log_error("Security Event [%s]: %s - Details: %s",
+                           args=(event_type, description, _Details(details.items())))
+        else:
+            self.log_error("Security Event [%s]: %s", args=(event_type, description))
 
 
 # Global audit logger instance
@@ -265,32 +558,57 @@ def get_audit_logger() -> AuditLogger:
     global _audit_logger
     if _audit_logger is None:
         _audit_logger = AuditLogger()
+        _bind_convenience_functions(_audit_logger)
     return _audit_logger
 
 
-def initialize_audit_logger(db: Optional[DatabaseConnection] = None) -> AuditLogger:
+def initialize_audit_logger(db: Optional['DatabaseConnection'] = None) -> AuditLogger:
     """Initialize audit logger with specific database connection"""
     global _audit_logger
     _audit_logger = AuditLogger(db)
+    _bind_convenience_functions(_audit_logger)
     return _audit_logger
 
 
+def _bind_convenience_functions(audit_logger: AuditLogger) -> None:
+    """Rebind the module-level audit_* helpers to the logger's bound methods.
+    
+    Until a logger exists, the helpers below create one lazily; afterwards a call
+    is a direct method call with no global lookup or getter in between.
+    """
+    global audit_return_valid, audit_return_invalid, audit_info, audit_error
+    audit_return_valid = audit_logger.log_return_valid
+    audit_return_invalid = audit_logger.log_return_invalid
+    audit_info = audit_logger.log_info
+    audit_error = audit_logger.log_error
+
+
+def flush_audit_logs() -> None:
+    """Write buffered audit entries of the global logger, if one exists"""
+    if _audit_logger is not None:
+        _audit_logger.flush()
+
+
 # Convenience functions for common audit operations
-def audit_return_valid(container_id: str, description: str, is_offline: bool = False) -> None:
+def audit_return_valid(container_id: str, description: str, is_offline: bool = False, *,
+                       args: tuple = ()) -> None:
     """Convenience function for logging valid returns"""
-    get_audit_logger().log_return_valid(container_id, description, is_offline)
+    get_audit_logger().log_return_valid(container_id, description, is_offline, args=args)
 
 
-def audit_return_invalid(container_id: str, description: str, is_offline: bool = False) -> None:
+def audit_return_invalid(container_id: str, description: str, is_offline: bool = False, *,
+                         args: tuple = ()) -> None:
     """Convenience function for logging invalid returns"""
-    get_audit_logger().log_return_invalid(container_id, description, is_offline)
+    get_audit_logger().log_return_invalid(container_id, description, is_offline, args=args)
 
 
-def audit_info(description: str, container_id: Optional[str] = None, is_offline: bool = False) -> None:
+def audit_info(description: str, container_id: Optional[str] = None, is_offline: bool = False, *,
+               args: tuple = ()) -> None:
     """Convenience function for logging info"""
-    get_audit_logger().log_info(description, container_id, is_offline)
+    get_audit_logger().log_info(description, container_id, is_offline, args=args)
 
 
-def audit_error(description: str, container_id: Optional[str] = None, is_offline: bool = False) -> None:
+def audit_error(description: str, container_id: Optional[str] = None, is_offline: bool = False, *,
+                args: tuple = ()) -> None:
     """Convenience function for logging errors"""
-    get_audit_logger().log_error(description, container_id, is_offline) 
\ No newline at end of file
+    get_audit_logger().log_error(description, container_id, is_offline, args=args) 
\ No newline at end of file
@@ -3,55 +3,129 @@ Simple configuration manager that loads settings from environment variables.
 """
 
 import os
-from typing import Any, Dict, Optional
+from functools import lru_cache
 from pathlib import Path
-from dotenv import load_dotenv
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple
 
-# Load environment variables from .env file
-env_path = Path('.env')
-if env_path.exists():
-    load_dotenv(env_path)
+
+@lru_cache(maxsize=None)
+def load_environment() -> None:
+    """Load the .env file into the environment, once per process.
+    
+    Deferred until configuration is first needed, so importing this module
+    does not touch the filesystem or python-dotenv.
+    """
+    env_path = Path('.env')
+    if not env_path.exists():
+        return
+    from dotenv import dotenv_values
+    # Variables already set in the environment win, as with load_dotenv
+    values = {k: v for k, v in dotenv_values(env_path).items() if v is not None}
+    os.environ.update({k: v for k, v in values.items() if k not in os.environ})
 
 
 class ConfigManager:
-    """Simple configuration manager for environment variables."""
+    """Simple configuration manager for environment variables.
+    
+    Every loaded setting is also a plain instance attribute (settings.database_url),
+    set once in __init__ since configuration does not change after load.
+    """
+    
+    raspberry_name: str
+    device_name: str
+    base_api_url: str
+    api_key: str
+    raspberry_api_key: str
+    healthcheck_interval: int
+    sync_interval: int
+    api_timeout: int
+    api_retry_attempts: int
+    api_compression: bool
+    database_url: str
+    uart_port: str
+    uart_baudrate: int
+    uart_low_latency: bool
+    audit_buffer_size: int
+    audit_batch_size: int
+    audit_flush_interval_ms: int
+    audit_queue_policy: str
+    audit_block_timeout_ms: int
+    audit_persist_types: Tuple[str, ...]
+    audit_coalesce_window_ms: int
+    log_level: str
+    log_file: str
+    debug: bool
+    app_version: str
+    qr_scanner_device: str
+    qr_regex_parse: bool
+    
+    # One slot per annotated setting above
+    __slots__ = ('_config',) + tuple(__annotations__)
     
     def __init__(self) -> None:
-        self._config: Dict[str, Any] = self._load_config()
+        self._config: Mapping[str, Any] = MappingProxyType(self._load_config())
+        for key, value in self._config.items():
+            setattr(self, key, value)
     
     def _load_config(self) -> Dict[str, Any]:
         """Load configuration from environment variables."""
+        load_environment()
+        env = os.environ.get
+        
+        def _int(key: str, default: str) -> int:
+            return int(env(key, default))
+        
+        def _bool(key: str, default: str) -> bool:
+            return env(key, default).lower() == 'true'
+        
         return {
             # Device Identity
-            'raspberry_name': os.getenv('RASPBERRY_NAME', 'device_001'),
-            'device_name': os.getenv('DEVICE_NAME', 'device_001'),  # Keep for backward compatibility
+            'raspberry_name': env('RASPBERRY_NAME', 'device_001'),
+            'device_name': env('DEVICE_NAME', 'device_001'),  # Keep for backward compatibility
             
             # API Configuration
-            'base_api_url': os.getenv('BASE_API_URL', ''),
-            'api_key': "Bearer " + os.getenv('API_KEY', ''),
-            'raspberry_api_key': os.getenv('RASPBERRY_API_KEY', ''),
-            'healthcheck_interval': int(os.getenv('HEALTHCHECK_INTERVAL', '180')),
-            'sync_interval': int(os.getenv('SYNC_INTERVAL', '600')),
-            'api_timeout': int(os.getenv('API_TIMEOUT', '30')),
-            'api_retry_attempts': int(os.getenv('API_RETRY_ATTEMPTS', '3')),
+            'base_api_url': env('BASE_API_URL', ''),
+            'api_key': "Bearer " + env('API_KEY', ''),
+            'raspberry_api_key': env('RASPBERRY_API_KEY', ''),
+            'healthcheck_interval': _int('HEALTHCHECK_INTERVAL', '180'),
+            'sync_interval': _int('SYNC_INTERVAL', '600'),
+            'api_timeout': _int('API_TIMEOUT', '30'),
+            'api_retry_attempts': _int('API_RETRY_ATTEMPTS', '3'),
+            'api_compression': _bool('API_COMPRESSION', 'false'),
             
             # Database
-            'database_url': os.getenv('DATABASE_URL', 'sqlite:///container_system.db'),
+            'database_url': env('DATABASE_URL', 'sqlite:///container_system.db'),
             
             # UART
-            'uart_port': os.getenv('UART_PORT', '/dev/ttyUSB0'),
-            'uart_baudrate': int(os.getenv('UART_BAUDRATE', '9600')),
+            'uart_port': env('UART_PORT', '/dev/ttyUSB0'),
+            'uart_baudrate': _int('UART_BAUDRATE', '9600'),
+            'uart_low_latency': env('UART_LOW_LATENCY', '1').lower() in ('1', 'true'),
+            
+            # Audit log buffering
+            'audit_buffer_size': _int('AUDIT_BUFFER_SIZE', '10000'),
+            'audit_batch_size': _int('AUDIT_BATCH_SIZE', '1024'),
+            'audit_flush_interval_ms': _int('AUDIT_FLUSH_INTERVAL_MS', '50'),
+            'audit_queue_policy': env('AUDIT_QUEUE_POLICY', 'block').lower(),
+            'audit_block_timeout_ms': _int('AUDIT_BLOCK_TIMEOUT_MS', '100'),
+            'audit_persist_types': tuple(
+                t.strip().upper() for t in
+                env('AUDIT_PERSIST_TYPES', 'ERROR,INFO,RETURN_VALID,RETURN_INVALID').split(',')
+                if t.strip()
+            ),
+            'audit_coalesce_window_ms': _int('AUDIT_COALESCE_WINDOW_MS', '1000'),
             
             # Logging
-            'log_level': os.getenv('LOG_LEVEL', 'INFO').upper(),
-            'log_file': os.getenv('LOG_FILE', 'logs/system.log'),
-            'debug': os.getenv('DEBUG', 'false').lower() == 'true',
+            'log_level': env('LOG_LEVEL', 'INFO').upper(),
+            'log_file': env('LOG_FILE', 'logs/system.log'),
+            'debug': _bool('DEBUG', 'false'),
             
             # Application
-            'app_version': os.getenv('APP_VERSION', '1.0.0'),
+            'app_version': env('APP_VERSION', '1.0.0'),
             
             # QR Scanner
-            'qr_scanner_device': os.getenv('QR_SCANNER_DEVICE', '/dev/hidraw2'),
+            'qr_scanner_device': env('QR_SCANNER_DEVICE', '/dev/hidraw2'),
+            'qr_regex_parse': _bool('QR_REGEX_PARSE', 'false'),
         }
     
     def get(self, key: str, default: Any = None) -> Any:
@@ -60,75 +134,7 @@ class ConfigManager:
     
     def get_all(self) -> Dict[str, Any]:
         """Get all configuration values."""
-        return self._config.copy()
-    
-    @property
-    def raspberry_name(self) -> str:
-        return self.get('raspberry_name')
-    
-    @property
-    def device_name(self) -> str:
-        return self.get('device_name')
-    
-    @property
-    def base_api_url(self) -> str:
-        return self.get('base_api_url')
-    
-    @property
-    def api_key(self) -> str:
-        return self.get('api_key')
-    
-    @property
-    def raspberry_api_key(self) -> str:
-        return self.get('raspberry_api_key')
-    
-    @property
-    def healthcheck_interval(self) -> int:
-        return self.get('healthcheck_interval')
-    
-    @property
-    def sync_interval(self) -> int:
-        return self.get('sync_interval')
-    
-    @property
-    def api_timeout(self) -> int:
-        return self.get('api_timeout')
-    
-    @property
-    def api_retry_attempts(self) -> int:
-        return self.get('api_retry_attempts')
-    
-    @property
-    def database_url(self) -> str:
-        return self.get('database_url')
-    
-    @property
-    def uart_port(self) -> str:
-        return self.get('uart_port')
-    
-    @property
-    def uart_baudrate(self) -> int:
-        return self.get('uart_baudrate')
-    
-    @property
-    def log_level(self) -> str:
-        return self.get('log_level')
-    
-    @property
-    def log_file(self) -> str:
-        return self.get('log_file')
-    
-    @property
-    def debug(self) -> bool:
-        return self.get('debug')
-    
-    @property
-    def app_version(self) -> str:
-        return self.get('app_version')
-    
-    @property
-    def qr_scanner_device(self) -> str:
-        return self.get('qr_scanner_device')
+        return dict(self._config)
 
 
 # Global config instance
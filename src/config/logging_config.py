@@ -2,14 +2,35 @@
 Simple logging configuration for the Container Return System.
 """
 
+import atexit
 import logging
 import logging.handlers
+import queue
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+
+# Background listener that owns the real handlers; log calls only enqueue records
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def stop_logging() -> None:
+    """Stop the log listener, writing out any queued records."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
 
 
 def setup_logging(config: Dict[str, Any]) -> None:
-    """Setup simple logging configuration."""
+    """Setup simple logging configuration.
+    
+    Console and file output run on a QueueListener thread, so logging calls
+    never wait on terminal or disk I/O (or file rotation).
+    """
+    global _listener
     
     # Get configuration values
     log_level = config.get("log_level", "INFO").upper()
@@ -21,8 +42,10 @@ def setup_logging(config: Dict[str, Any]) -> None:
     log_path.parent.mkdir(parents=True, exist_ok=True)
     
     # Clear existing handlers
+    stop_logging()
     root_logger = logging.getLogger()
     root_logger.handlers.clear()
+    handlers: List[logging.Handler] = []
     
     # Set log level
     level = logging.DEBUG if debug else getattr(logging, log_level, logging.INFO)
@@ -38,7 +61,7 @@ def setup_logging(config: Dict[str, Any]) -> None:
     console_handler = logging.StreamHandler()
     console_handler.setLevel(level)
     console_handler.setFormatter(formatter)
-    root_logger.addHandler(console_handler)
+    handlers.append(console_handler)
     
     # File handler
     try:
@@ -50,11 +73,17 @@ def setup_logging(config: Dict[str, Any]) -> None:
         )
         file_handler.setLevel(logging.INFO)
         file_handler.setFormatter(formatter)
-        root_logger.addHandler(file_handler)
+        handlers.append(file_handler)
         
     except Exception as e:
         print(f"Warning: Could not setup file logging: {e}")
     
+    # Hand records to the listener thread through an unbounded queue
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    
     # Configure third-party loggers
     logging.getLogger("httpx").setLevel(logging.WARNING)
     logging.getLogger("urllib3").setLevel(logging.WARNING) 
\ No newline at end of file
@@ -4,26 +4,46 @@ Simple configuration validator for environment variables.
 
 import os
 from pathlib import Path
-from typing import  Dict, Any
+from typing import  Dict, Any, Mapping, Optional
+
+from .config_manager import load_environment
+
+_LOG_LEVEL_NAMES = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+_BAUDRATE_VALUES = (9600, 19200, 38400, 57600, 115200)
+
+# Sets for membership checks, text built once for error messages
+VALID_LOG_LEVELS = frozenset(_LOG_LEVEL_NAMES)
+VALID_BAUDRATES = frozenset(_BAUDRATE_VALUES)
+_LOG_LEVELS_TEXT = ', '.join(_LOG_LEVEL_NAMES)
+_BAUDRATES_TEXT = ', '.join(map(str, _BAUDRATE_VALUES))
 
 
 class ConfigValidator:
     """Validates configuration values."""
     
     @staticmethod
-    def validate() -> Dict[str, Any]:
+    def validate(env: Optional[Mapping[str, str]] = None) -> Dict[str, Any]:
         """
         Validate configuration and return errors/warnings.
         
+        Raw values are checked rather than ConfigManager's, since those are
+        already converted (and a bad integer would fail before reporting).
+        
+        Args:
+            env: Environment mapping to validate (defaults to os.environ with .env loaded)
+        
         Returns:
             Dict with 'errors' and 'warnings' lists, and 'valid' boolean
         """
+        if env is None:
+            load_environment()
+            env = os.environ
         errors = []
         warnings = []
         
         # Validate API keys (required for production)
-        api_key = os.getenv('API_KEY', '')
-        raspberry_api_key = os.getenv('RASPBERRY_API_KEY', '')
+        api_key = env.get('API_KEY', '')
+        raspberry_api_key = env.get('RASPBERRY_API_KEY', '')
         
         if not api_key:
             errors.append("API_KEY not set - required for API authentication")
@@ -32,27 +52,25 @@ class ConfigValidator:
             errors.append("RASPBERRY_API_KEY not set - required for device authentication")
         
         # Validate raspberry name
-        raspberry_name = os.getenv('RASPBERRY_NAME', 'device_001')
+        raspberry_name = env.get('RASPBERRY_NAME', 'device_001')
         if raspberry_name == 'device_001':
             errors.append("RASPBERRY_NAME using default value - consider setting unique device name")
         
         # Validate log level
-        log_level = os.getenv('LOG_LEVEL', 'INFO').upper()
-        valid_levels = ['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL']
-        if log_level not in valid_levels:
-            errors.append(f"Invalid LOG_LEVEL '{log_level}'. Must be one of: {', '.join(valid_levels)}")
+        log_level = env.get('LOG_LEVEL', 'INFO').upper()
+        if log_level not in VALID_LOG_LEVELS:
+            errors.append(f"Invalid LOG_LEVEL '{log_level}'. Must be one of: {_LOG_LEVELS_TEXT}")
         
         # Validate UART baudrate
         try:
-            baudrate = int(os.getenv('UART_BAUDRATE', '9600'))
-            valid_rates = [9600, 19200, 38400, 57600, 115200]
-            if baudrate not in valid_rates:
-                errors.append(f"Invalid UART_BAUDRATE '{baudrate}'. Must be one of: {', '.join(map(str, valid_rates))}")
+            baudrate = int(env.get('UART_BAUDRATE', '9600'))
+            if baudrate not in VALID_BAUDRATES:
+                errors.append(f"Invalid UART_BAUDRATE '{baudrate}'. Must be one of: {_BAUDRATES_TEXT}")
         except ValueError:
             errors.append("UART_BAUDRATE must be a valid integer")
         
         # Check if log directory can be created
-        log_file = os.getenv('LOG_FILE', 'logs/system.log')
+        log_file = env.get('LOG_FILE', 'logs/system.log')
         log_path = Path(log_file)
         try:
             log_path.parent.mkdir(parents=True, exist_ok=True)
@@ -60,7 +78,7 @@ class ConfigValidator:
             errors.append(f"Cannot create log directory: {e}")
         
         # Check database directory
-        database_url = os.getenv('DATABASE_URL', 'sqlite:///container_system.db')
+        database_url = env.get('DATABASE_URL', 'sqlite:///container_system.db')
         if database_url.startswith('sqlite:///'):
             db_path = Path(database_url[10:])  # Remove 'sqlite:///'
             try:
@@ -69,8 +87,8 @@ class ConfigValidator:
                 errors.append(f"Cannot create database directory: {e}")
         
         # Check UART port (warning only)
-        uart_port = os.getenv('UART_PORT', '/dev/ttyUSB0')
-        debug = os.getenv('DEBUG', 'false').lower() == 'true'
+        uart_port = env.get('UART_PORT', '/dev/ttyUSB0')
+        debug = env.get('DEBUG', 'false').lower() == 'true'
         if not debug and not Path(uart_port).exists():
             warnings.append(f"UART port not accessible: {uart_port}")
         
@@ -4,28 +4,92 @@ Database connection management for the Container Return System
 
 import sqlite3
 import logging
+import time
+import weakref
 from contextlib import contextmanager
-from datetime import datetime
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import Optional, Generator, Any, Dict, List
-from threading import Lock
+from threading import Lock, RLock, local
 
 logger = logging.getLogger(__name__)
 
+# Compiled statements kept per connection (sqlite3 defaults to 128); large enough
+# that every fixed CRUD query stays prepared
+STATEMENT_CACHE_SIZE = 256
+
+TRANSACTION_MODES = ("DEFERRED", "IMMEDIATE", "EXCLUSIVE")
+
+# Transaction control statements as fixed strings, so they stay in the statement cache
+BEGIN_SQL = {mode: f"BEGIN {mode}" for mode in TRANSACTION_MODES}
+COMMIT_SQL = "COMMIT"
+ROLLBACK_SQL = "ROLLBACK"
+
+# Seconds between PRAGMA optimize runs on a long-lived connection
+OPTIMIZE_INTERVAL = 15 * 60
+
+# Audit log ids are local only (never synced), so they are plain rowids
+AUDIT_LOG_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS {name} (
+        id INTEGER PRIMARY KEY,
+        type TEXT NOT NULL CHECK (type IN ('ERROR', 'INFO', 'RETURN_VALID', 'RETURN_INVALID')),
+        description TEXT NOT NULL,
+        isOfflineAction BOOLEAN NOT NULL,
+        containerId TEXT,
+        createdAt DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
 
 class DatabaseError(Exception):
     """Custom exception for database operations"""
     pass
 
 
+class _Reader:
+    """A thread's read connection, held only by that thread's local storage"""
+    __slots__ = ("conn", "generation", "__weakref__")
+    
+    def __init__(self, conn: sqlite3.Connection, generation: int):
+        self.conn = conn
+        self.generation = generation
+
+
+def _close_reader(lock: Lock, readers: List[sqlite3.Connection], conn: sqlite3.Connection) -> None:
+    """Close a reader whose thread has ended, unless close() already did"""
+    with lock:
+        if conn not in readers:
+            return
+        readers.remove(conn)
+    conn.close()
+
+
 class DatabaseConnection:
-    """SQLite database connection manager with proper error handling"""
+    """SQLite database connection manager with proper error handling.
+    
+    Writes go through one shared writer connection (get_transaction), serialized
+    by a lock since SQLite allows a single writer anyway. Reads use a connection
+    per thread, so under WAL they run concurrently with each other and with the
+    writer instead of queueing on one connection.
+    """
     
     def __init__(self, database_url: str):
         self.database_url = database_url
+        # Resolved once; the pool opens a connection per thread from this path
+        self._db_path = self._get_db_path()
+        if self._db_path != ":memory:":
+            Path(self._db_path).parent.mkdir(parents=True, exist_ok=True)
+        # Guards creation of the writer and the registry of reader connections
         self._lock = Lock()
+        # Serializes transactions from different threads on the writer connection
+        self._transaction_lock = RLock()
         self._connection: Optional[sqlite3.Connection] = None
+        self._local = local()
+        self._readers: List[sqlite3.Connection] = []
+        # Bumped on close so threads drop reader connections that were closed under them
+        self._generation = 0
         self._is_initialized = False
+        self._last_optimize = time.monotonic()
         
     def _get_db_path(self) -> str:
         """Extract database path from URL"""
@@ -33,24 +97,38 @@ class DatabaseConnection:
             return self.database_url[10:]  # Remove "sqlite:///"
         return self.database_url
     
-    def _create_connection(self) -> sqlite3.Connection:
-        """Create a new database connection with proper settings"""
+    def _create_connection(self, reader: bool = False) -> sqlite3.Connection:
+        """Create a new database connection with proper settings.
+        
+        Reader connections skip the settings that only matter to the writer
+        (journal mode, which persists in the database file, and WAL size and
+        checkpointing) and are opened query_only.
+        """
         try:
-            db_path = self._get_db_path()
-            
-            # Ensure directory exists
-            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            db_path = self._db_path
             
             # Create connection with WAL mode for better concurrency
             conn = sqlite3.connect(
                 db_path,
                 check_same_thread=False,
                 timeout=30.0,  # 30 second timeout
-                isolation_level=None  # Enable autocommit mode
+                isolation_level=None,  # Enable autocommit mode
+                cached_statements=STATEMENT_CACHE_SIZE
             )
             
-            # Enable WAL mode for better concurrency
-            conn.execute("PRAGMA journal_mode=WAL")
+            if reader:
+                conn.execute("PRAGMA query_only=ON")
+            else:
+                # Enable WAL mode for better concurrency
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA journal_size_limit=67108864")  # truncate WAL back to 64 MB
+                conn.execute("PRAGMA wal_autocheckpoint=1000")  # pages
+            
+            # In WAL mode NORMAL only syncs at checkpoints, not on every commit
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA mmap_size=268435456")  # 256 MB
+            conn.execute("PRAGMA cache_size=-65536")  # 64 MB page cache
             
             # Enable foreign key constraints
             conn.execute("PRAGMA foreign_keys=ON")
@@ -65,25 +143,76 @@ class DatabaseConnection:
             logger.error(f"Failed to create database connection: {e}")
             raise DatabaseError(f"Database connection failed: {e}")
     
-    def get_connection(self) -> sqlite3.Connection:
-        """Get or create database connection"""
+    def get_write_connection(self) -> sqlite3.Connection:
+        """Get or create the shared writer connection"""
         with self._lock:
             if self._connection is None:
                 self._connection = self._create_connection()
             return self._connection
     
+    def get_connection(self) -> sqlite3.Connection:
+        """Get or create the calling thread's read connection"""
+        reader = getattr(self._local, "reader", None)
+        if reader is not None and reader.generation == self._generation:
+            return reader.conn
+        
+        if self._db_path == ":memory:":
+            # Every connection to :memory: is a separate database
+            return self.get_write_connection()
+        
+        if self._connection is None:
+            # The writer switches the database file to WAL before any reader uses it
+            self.get_write_connection()
+        conn = self._create_connection(reader=True)
+        with self._lock:
+            self._readers.append(conn)
+            reader = _Reader(conn, self._generation)
+        # Thread-local values are dropped when their thread exits, so short-lived
+        # threads (API callbacks, executor workers) do not leak connections
+        weakref.finalize(reader, _close_reader, self._lock, self._readers, conn)
+        self._local.reader = reader
+        return conn
+    
     @contextmanager
-    def get_transaction(self) -> Generator[sqlite3.Connection, None, None]:
-        """Context manager for database transactions"""
-        conn = self.get_connection()
+    def get_transaction(self, mode: str = "IMMEDIATE") -> Generator[sqlite3.Connection, None, None]:
+        """Context manager for database transactions.
+        
+        Transactions are for writes, so the default takes the write lock up front
+        (IMMEDIATE) instead of upgrading from a read lock mid-transaction, which
+        fails with SQLITE_BUSY if another process wrote meanwhile. Plain reads
+        (fetchone/fetchall/execute_query) run in autocommit mode with no BEGIN/COMMIT.
+        """
+        begin = BEGIN_SQL.get(mode)
+        if begin is None:
+            raise ValueError(f"Invalid transaction mode: {mode}")
+        conn = self.get_write_connection()
+        with self._transaction_lock:
+            # Started outside the try: if BEGIN itself fails (busy, locked) there is
+            # no transaction to roll back, and the original error must surface
+            try:
+                conn.execute(begin)
+            except sqlite3.Error as e:
+                logger.error(f"Failed to begin transaction: {e}")
+                raise DatabaseError(f"Transaction failed: {e}")
+            try:
+                yield conn
+                conn.execute(COMMIT_SQL)
+            except Exception as e:
+                if conn.in_transaction:
+                    conn.execute(ROLLBACK_SQL)
+                logger.error(f"Transaction rolled back: {e}")
+                raise DatabaseError(f"Transaction failed: {e}")
+            
+            if time.monotonic() - self._last_optimize >= OPTIMIZE_INTERVAL:
+                self._optimize(conn)
+    
+    def _optimize(self, conn: sqlite3.Connection) -> None:
+        """Let SQLite refresh query planner statistics where they are stale"""
+        self._last_optimize = time.monotonic()
         try:
-            conn.execute("BEGIN TRANSACTION")
-            yield conn
-            conn.execute("COMMIT")
-        except Exception as e:
-            conn.execute("ROLLBACK")
-            logger.error(f"Transaction rolled back: {e}")
-            raise DatabaseError(f"Transaction failed: {e}")
+            conn.execute("PRAGMA optimize")
+        except sqlite3.Error as e:
+            logger.warning(f"PRAGMA optimize failed: {e}")
     
     def execute_query(self, query: str, params: Optional[Any] = None) -> sqlite3.Cursor:
         """Execute a query with optional parameters"""
@@ -97,8 +226,8 @@ class DatabaseConnection:
             raise DatabaseError(f"Query execution failed: {e}")
     
     def execute_many(self, query: str, params_list: List[Any]) -> sqlite3.Cursor:
-        """Execute query with multiple parameter sets"""
-        conn = self.get_connection()
+        """Execute query with multiple parameter sets on the writer connection"""
+        conn = self.get_write_connection()
         try:
             return conn.executemany(query, params_list)
         except sqlite3.Error as e:
@@ -116,19 +245,24 @@ class DatabaseConnection:
         return cursor.fetchall()
     
     def initialize_database(self) -> None:
-        """Initialize database with required tables"""
+        """Initialize database with required tables, once per instance"""
         if self._is_initialized:
             return
             
         try:
             with self.get_transaction() as conn:
+                # Re-checked under the transaction lock: another thread may have
+                # initialized the schema while this one waited
+                if self._is_initialized:
+                    return
+                
                 # Create Container table
                 conn.execute("""
                     CREATE TABLE IF NOT EXISTS Container (
                         id TEXT PRIMARY KEY,
                         qrCode TEXT UNIQUE NOT NULL,
                         isReturnable BOOLEAN NOT NULL,
-                        dueDate DATETIME,
+                        dueDate INTEGER,
                         updatedAt DATETIME DEFAULT CURRENT_TIMESTAMP
                     )
                 """)
@@ -147,29 +281,34 @@ class DatabaseConnection:
                     )
                 """)
                 
-                # Create AuditLog table
-                conn.execute("""
-                    CREATE TABLE IF NOT EXISTS AuditLog (
-                        id TEXT PRIMARY KEY,
-                        type TEXT NOT NULL CHECK (type IN ('ERROR', 'INFO', 'RETURN_VALID', 'RETURN_INVALID')),
-                        description TEXT NOT NULL,
-                        isOfflineAction BOOLEAN NOT NULL,
-                        containerId TEXT,
-                        createdAt DATETIME DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (containerId) REFERENCES Container(id)
-                    )
-                """)
+                # Create AuditLog table. containerId is a soft reference (no foreign key),
+                # so audit rows survive container deletion and batch inserts never abort
+                conn.execute(AUDIT_LOG_TABLE_SQL.format(name="AuditLog"))
+                self._migrate_audit_log_table(conn)
+                self._migrate_container_due_dates(conn)
                 
                 # Create indexes for performance
                 conn.execute("CREATE INDEX IF NOT EXISTS idx_container_qrcode ON Container(qrCode)")
-                conn.execute("CREATE INDEX IF NOT EXISTS idx_container_updated ON Container(updatedAt)")
-                conn.execute("CREATE INDEX IF NOT EXISTS idx_auditlog_created ON AuditLog(createdAt)")
-                conn.execute("CREATE INDEX IF NOT EXISTS idx_auditlog_type ON AuditLog(type)")
+                # Covering indexes: time-range reads (including the sync queries, which
+                # filter on containerId inside the index) never touch the table B-tree
+                conn.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_container_updated_cover
+                    ON Container(updatedAt, id, qrCode, isReturnable, dueDate)
+                """)
+                conn.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_auditlog_created_cover
+                    ON AuditLog(createdAt, type, description, isOfflineAction, containerId)
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_auditlog_type_created ON AuditLog(type, createdAt)")
+                # Superseded by the indexes above
+                for index in ("idx_container_updated", "idx_auditlog_created",
+                              "idx_auditlog_created_syncable", "idx_auditlog_type"):
+                    conn.execute(f"DROP INDEX IF EXISTS {index}")
                 
                 # Initialize DeviceStatus if not exists
                 existing_status = conn.execute("SELECT COUNT(*) FROM DeviceStatus").fetchone()
                 if existing_status[0] == 0:
-                    now = datetime.utcnow().isoformat()
+                    now = datetime.now(timezone.utc).isoformat()
                     conn.execute("""
                         INSERT INTO DeviceStatus (lastSyncAt, lastSeenAt, version)
                         VALUES (?, ?, ?)
@@ -182,10 +321,52 @@ class DatabaseConnection:
             logger.error(f"Database initialization failed: {e}")
             raise DatabaseError(f"Database initialization failed: {e}")
     
+    def _migrate_audit_log_table(self, conn: sqlite3.Connection) -> None:
+        """Rebuild an AuditLog table from an older schema: TEXT (UUID) ids, or the
+        old foreign key on containerId"""
+        id_type = next(
+            (col[2] for col in conn.execute("PRAGMA table_info(AuditLog)") if col[1] == "id"), None
+        )
+        row = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'AuditLog'"
+        ).fetchone()
+        if id_type is None or (id_type.upper() == "INTEGER" and "REFERENCES" not in row[0]):
+            return
+        
+        # SQLite cannot change a column or drop a constraint in place; the copy numbers
+        # the rows in creation order, and indexes are recreated by the caller
+        conn.execute(AUDIT_LOG_TABLE_SQL.format(name="AuditLog_new"))
+        conn.execute("""
+            INSERT INTO AuditLog_new (type, description, isOfflineAction, containerId, createdAt)
+            SELECT type, description, isOfflineAction, containerId, createdAt FROM AuditLog
+            ORDER BY createdAt, rowid
+        """)
+        conn.execute("DROP TABLE AuditLog")
+        conn.execute("ALTER TABLE AuditLog_new RENAME TO AuditLog")
+        logger.info("Migrated AuditLog table to integer ids without containerId foreign key")
+    
+    def _migrate_container_due_dates(self, conn: sqlite3.Connection) -> None:
+        """Convert ISO text due dates from older databases to UTC epoch seconds.
+        
+        The old DATETIME column has numeric affinity, so the integers are stored as
+        such without rebuilding the table; naive values are taken as UTC, as before.
+        """
+        cursor = conn.execute("""
+            UPDATE Container SET dueDate = CAST(strftime('%s', dueDate) AS INTEGER)
+            WHERE typeof(dueDate) = 'text'
+        """)
+        if cursor.rowcount > 0:
+            logger.info(f"Migrated {cursor.rowcount} container due dates to epoch seconds")
+    
     def close(self) -> None:
-        """Close database connection"""
+        """Close the writer and every thread's read connection"""
         with self._lock:
+            self._generation += 1
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
             if self._connection:
+                self._optimize(self._connection)
                 self._connection.close()
                 self._connection = None
                 logger.info("Database connection closed")
@@ -197,21 +378,27 @@ class DatabaseConnection:
         self.close()
 
 
-# Global database instance
-_db_instance: Optional[DatabaseConnection] = None
+# Shared database instances, one persistent connection per URL. A dict behind a
+# double-checked lock rather than lru_cache, which may run the factory twice for
+# concurrent first calls
+_db_instances: Dict[str, DatabaseConnection] = {}
+_db_instances_lock = Lock()
 
 
 def get_database(database_url: str) -> DatabaseConnection:
-    """Get or create database instance"""
-    global _db_instance
-    if _db_instance is None:
-        _db_instance = DatabaseConnection(database_url)
-    return _db_instance
+    """Get or create database instance for the given URL"""
+    db = _db_instances.get(database_url)
+    if db is None:
+        with _db_instances_lock:
+            db = _db_instances.get(database_url)
+            if db is None:
+                db = _db_instances[database_url] = DatabaseConnection(database_url)
+    return db
 
 
 def close_database() -> None:
-    """Close global database instance"""
-    global _db_instance
-    if _db_instance:
-        _db_instance.close()
-        _db_instance = None 
\ No newline at end of file
+    """Close all shared database instances"""
+    with _db_instances_lock:
+        for db in _db_instances.values():
+            db.close()
+        _db_instances.clear() 
\ No newline at end of file
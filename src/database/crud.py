@@ -3,18 +3,128 @@ CRUD operations for the Container Return System database
 """
 
 import logging
-from datetime import datetime
-from typing import Optional, List, Dict, Any
-from uuid import uuid4
+import sqlite3
+from datetime import datetime, timezone
+from typing import Optional, List, Dict, Any, Sequence, Tuple, Iterator
 
 from .connection import DatabaseConnection, DatabaseError
 from .models import (
     Container, DeviceStatus, AuditLog, LogType,
-    ContainerCreate, DeviceStatusUpdate, AuditLogCreate
+    ContainerCreate, DeviceStatusUpdate, AuditLogCreate, new_id, to_epoch, uuid_batch
 )
 
 logger = logging.getLogger(__name__)
 
+# Stay well under SQLite's host parameter limit for IN (...) lists
+MAX_SQL_VARIABLES = 500
+
+# Rows pulled per fetchmany() call when streaming large result sets
+FETCH_BATCH_SIZE = 1024
+
+# Reads name their columns instead of SELECT *, in this order, so row builders can
+# index rows positionally
+CONTAINER_COLUMNS = "id, qrCode, isReturnable, dueDate, updatedAt"
+DEVICE_STATUS_COLUMNS = "id, lastSyncAt, lastSeenAt, version, updateFailures, active, isInSafeMode"
+AUDIT_LOG_COLUMNS = "id, type, description, isOfflineAction, containerId, createdAt"
+
+# UPDATE/INSERT ... RETURNING needs SQLite 3.35+; older libraries re-read the row instead
+HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+
+def _returning(columns: str) -> str:
+    return f" RETURNING {columns}" if HAS_RETURNING else ""
+
+# Fixed statements are module constants so every call hands sqlite3 the same text,
+# which its per-connection statement cache keeps compiled
+
+INSERT_CONTAINER_SQL = """
+    INSERT INTO Container (id, qrCode, isReturnable, dueDate, updatedAt)
+    VALUES (?, ?, ?, ?, ?)
+"""
+UPSERT_CONTAINER_SQL = """
+    INSERT INTO Container (id, qrCode, isReturnable, dueDate, updatedAt)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET
+        qrCode = excluded.qrCode,
+        isReturnable = excluded.isReturnable,
+        dueDate = excluded.dueDate,
+        updatedAt = excluded.updatedAt
+    WHERE Container.qrCode IS NOT excluded.qrCode
+       OR Container.isReturnable IS NOT excluded.isReturnable
+       OR Container.dueDate IS NOT excluded.dueDate
+"""
+# Partial updates bind NULL for fields left unchanged, so one statement covers every
+# combination of fields instead of building the SET list per call
+UPDATE_CONTAINER_SQL = """
+    UPDATE Container SET
+        qrCode = COALESCE(:qrCode, qrCode),
+        isReturnable = COALESCE(:isReturnable, isReturnable),
+        dueDate = COALESCE(:dueDate, dueDate),
+        updatedAt = :updatedAt
+    WHERE id = :id
+""" + _returning(CONTAINER_COLUMNS)
+SELECT_CONTAINER_BY_ID_SQL = f"SELECT {CONTAINER_COLUMNS} FROM Container WHERE id = ?"
+SELECT_CONTAINER_BY_QR_SQL = f"SELECT {CONTAINER_COLUMNS} FROM Container WHERE qrCode = ?"
+SELECT_ID_BY_QR_SQL = "SELECT id FROM Container WHERE qrCode = ?"
+SELECT_CONTAINERS_SQL = f"SELECT {CONTAINER_COLUMNS} FROM Container ORDER BY updatedAt DESC"
+SELECT_CONTAINERS_LIMIT_SQL = SELECT_CONTAINERS_SQL + " LIMIT ?"
+SELECT_CONTAINERS_SINCE_SQL = f"SELECT {CONTAINER_COLUMNS} FROM Container WHERE updatedAt > ? ORDER BY updatedAt DESC"
+SELECT_CONTAINERS_SINCE_LIMIT_SQL = SELECT_CONTAINERS_SINCE_SQL + " LIMIT ?"
+SELECT_CONTAINER_SYNC_ROWS_SQL = (
+    "SELECT id, isReturnable, updatedAt FROM Container WHERE updatedAt > ? ORDER BY updatedAt DESC"
+)
+SELECT_CONTAINER_IDS_SQL = "SELECT id FROM Container"
+DELETE_CONTAINER_SQL = "DELETE FROM Container WHERE id = ?"
+DELETE_MOVED_QR_CODE_SQL = "DELETE FROM Container WHERE qrCode = ? AND id != ?"
+DELETE_ALL_CONTAINERS_SQL = "DELETE FROM Container"
+
+SELECT_DEVICE_STATUS_SQL = f"SELECT {DEVICE_STATUS_COLUMNS} FROM DeviceStatus WHERE id = 1"
+SELECT_DEVICE_STATUS_FLAGS_SQL = "SELECT active, isInSafeMode FROM DeviceStatus WHERE id = 1"
+UPDATE_DEVICE_STATUS_SQL = """
+    UPDATE DeviceStatus SET
+        lastSyncAt = COALESCE(:lastSyncAt, lastSyncAt),
+        lastSeenAt = COALESCE(:lastSeenAt, lastSeenAt),
+        version = COALESCE(:version, version),
+        updateFailures = COALESCE(:updateFailures, updateFailures),
+        active = COALESCE(:active, active),
+        isInSafeMode = COALESCE(:isInSafeMode, isInSafeMode)
+    WHERE id = 1
+""" + _returning(DEVICE_STATUS_COLUMNS)
+
+SELECT_AUDIT_LOG_BY_ID_SQL = f"SELECT {AUDIT_LOG_COLUMNS} FROM AuditLog WHERE id = ?"
+SELECT_AUDIT_LOGS_SINCE_SQL = f"SELECT {AUDIT_LOG_COLUMNS} FROM AuditLog WHERE createdAt >= ? ORDER BY createdAt DESC"
+SELECT_AUDIT_LOGS_SINCE_LIMIT_SQL = SELECT_AUDIT_LOGS_SINCE_SQL + " LIMIT ?"
+SELECT_SYNCABLE_AUDIT_LOGS_SINCE_SQL = (
+    f"SELECT {AUDIT_LOG_COLUMNS} FROM AuditLog WHERE createdAt >= ? AND containerId IS NOT NULL ORDER BY createdAt DESC"
+)
+SELECT_SYNCABLE_AUDIT_LOGS_SINCE_LIMIT_SQL = SELECT_SYNCABLE_AUDIT_LOGS_SINCE_SQL + " LIMIT ?"
+SELECT_AUDIT_LOG_SYNC_ROWS_SQL = f"""
+    SELECT {AUDIT_LOG_COLUMNS}
+    FROM AuditLog
+    WHERE createdAt >= ? AND containerId IS NOT NULL
+    ORDER BY createdAt DESC
+"""
+SELECT_AUDIT_LOGS_BY_TYPE_SQL = f"SELECT {AUDIT_LOG_COLUMNS} FROM AuditLog WHERE type = ? ORDER BY createdAt DESC"
+SELECT_AUDIT_LOGS_BY_TYPE_LIMIT_SQL = SELECT_AUDIT_LOGS_BY_TYPE_SQL + " LIMIT ?"
+DELETE_AUDIT_LOGS_BEFORE_SQL = "DELETE FROM AuditLog WHERE createdAt < ?"
+DELETE_UNSYNCABLE_AUDIT_LOGS_BEFORE_SQL = "DELETE FROM AuditLog WHERE containerId IS NULL AND createdAt < ?"
+DELETE_AUDIT_LOG_SQL = "DELETE FROM AuditLog WHERE id = ?"
+DELETE_ALL_AUDIT_LOGS_SQL = "DELETE FROM AuditLog"
+
+# AuditLog.containerId is a soft reference: an unknown container id is moved into the
+# description and stored as NULL, as one statement, so a batch never aborts on it.
+# A NULL id lets SQLite assign the next rowid
+INSERT_AUDIT_LOG_SQL = """
+    INSERT OR IGNORE INTO AuditLog (id, type, description, isOfflineAction, containerId, createdAt)
+    SELECT ?1, ?2,
+           CASE WHEN ?5 IS NULL OR c.id IS NOT NULL THEN ?3
+                ELSE ?3 || ' (Container ID: ' || ?5 || ' - not found in DB)' END,
+           ?4, c.id, ?6
+    FROM (SELECT 1) LEFT JOIN Container c ON c.id = ?5
+"""
+# Single-row form; the stored description/containerId may differ from the input
+INSERT_AUDIT_LOG_RETURNING_SQL = INSERT_AUDIT_LOG_SQL + _returning(AUDIT_LOG_COLUMNS)
+
 
 class ContainerCRUD:
     """CRUD operations for Container table"""
@@ -25,44 +135,67 @@ class ContainerCRUD:
     def create(self, container_data: ContainerCreate) -> Container:
         """Create a new container"""
         try:
-            container_id = str(uuid4())
-            now = datetime.utcnow().isoformat()
+            container_id = new_id()
+            now = datetime.utcnow()
             
             with self.db.get_transaction() as conn:
-                conn.execute("""
-                    INSERT INTO Container (id, qrCode, isReturnable, dueDate, updatedAt)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (
+                conn.execute(INSERT_CONTAINER_SQL, (
                     container_id,
                     container_data.qr_code,
                     1 if container_data.is_returnable else 0,
-                    container_data.due_date.isoformat() if container_data.due_date else None,
-                    now
+                    container_data.due_date,
+                    now.isoformat()
                 ))
             
             logger.info(f"Container created: {container_id}")
-            return self.get_by_id(container_id) # type: ignore
+            return Container(
+                id=container_id,
+                qr_code=container_data.qr_code,
+                is_returnable=container_data.is_returnable,
+                due_date=container_data.due_date,
+                updated_at=now
+            )
             
         except Exception as e:
             logger.error(f"Failed to create container: {e}")
             raise DatabaseError(f"Container creation failed: {e}")
     
+    def create_many(self, records: Sequence[ContainerCreate]) -> List[str]:
+        """Create many containers in a single transaction and return their new IDs"""
+        if not records:
+            return []
+        
+        try:
+            now = datetime.utcnow().isoformat()
+            ids = uuid_batch(len(records))
+            params = [
+                (
+                    container_id,
+                    record.qr_code,
+                    1 if record.is_returnable else 0,
+                    record.due_date,
+                    now
+                )
+                for container_id, record in zip(ids, records)
+            ]
+            
+            with self.db.get_transaction() as conn:
+                conn.executemany(INSERT_CONTAINER_SQL, params)
+            
+            logger.info(f"Created {len(ids)} containers")
+            return ids
+            
+        except Exception as e:
+            logger.error(f"Failed to create {len(records)} containers: {e}")
+            raise DatabaseError(f"Container bulk creation failed: {e}")
+    
     def get_by_id(self, container_id: str) -> Optional[Container]:
         """Get container by ID"""
         try:
-            row = self.db.fetchone(
-                "SELECT * FROM Container WHERE id = ?",
-                (container_id,)
-            )
+            row = self.db.fetchone(SELECT_CONTAINER_BY_ID_SQL, (container_id,))
             
             if row:
-                return Container(
-                    id=row["id"],
-                    qrCode=row["qrCode"],
-                    isReturnable=bool(row["isReturnable"]),
-                    dueDate=datetime.fromisoformat(row["dueDate"]) if row["dueDate"] else None,
-                    updatedAt=datetime.fromisoformat(row["updatedAt"])
-                )
+                return Container.from_row(row)
             return None
             
         except Exception as e:
@@ -72,66 +205,55 @@ class ContainerCRUD:
     def get_by_qr_code(self, qr_code: str) -> Optional[Container]:
         """Get container by QR code"""
         try:
-            row = self.db.fetchone(
-                "SELECT * FROM Container WHERE qrCode = ?",
-                (qr_code,)
-            )
+            row = self.db.fetchone(SELECT_CONTAINER_BY_QR_SQL, (qr_code,))
             
             if row:
-                return Container(
-                    id=row["id"],
-                    qrCode=row["qrCode"],
-                    isReturnable=bool(row["isReturnable"]),
-                    dueDate=datetime.fromisoformat(row["dueDate"]) if row["dueDate"] else None,
-                    updatedAt=datetime.fromisoformat(row["updatedAt"])
-                )
+                return Container.from_row(row)
             return None
             
         except Exception as e:
             logger.error(f"Failed to get container by QR code {qr_code}: {e}")
             raise DatabaseError(f"Container retrieval failed: {e}")
     
+    def get_id_by_qr_code(self, qr_code: str) -> Optional[str]:
+        """Get only the container ID for a QR code"""
+        try:
+            row = self.db.fetchone(SELECT_ID_BY_QR_SQL, (qr_code,))
+            return row[0] if row else None
+            
+        except Exception as e:
+            logger.error(f"Failed to look up QR code {qr_code}: {e}")
+            raise DatabaseError(f"Container lookup failed: {e}")
+    
     def update(self, container_id: str, updates: Dict[str, Any]) -> Optional[Container]:
         """Update container with given fields"""
         try:
             if not updates:
                 return self.get_by_id(container_id)
             
-            # Add updated timestamp
-            updates["updatedAt"] = datetime.utcnow().isoformat()
-            
-            # Build dynamic update query
-            set_clauses = []
-            params = {}
-            
-            for field, value in updates.items():
-                if field == "due_date" and value:
-                    set_clauses.append("dueDate = :dueDate")
-                    params["dueDate"] = value.isoformat() if isinstance(value, datetime) else value
-                elif field == "is_returnable":
-                    set_clauses.append("isReturnable = :isReturnable")
-                    params["isReturnable"] = 1 if value else 0
-                elif field == "qr_code":
-                    set_clauses.append("qrCode = :qrCode")
-                    params["qrCode"] = value
-                elif field == "updatedAt":
-                    set_clauses.append("updatedAt = :updatedAt")
-                    params["updatedAt"] = value
-            
-            if not set_clauses:
-                return self.get_by_id(container_id)
-            
-            params["id"] = container_id
-            query = f"UPDATE Container SET {', '.join(set_clauses)} WHERE id = :id"
+            # Fields left as None keep their stored value
+            due_date = updates.get("due_date")
+            is_returnable = updates.get("is_returnable")
+            params = {
+                "id": container_id,
+                "qrCode": updates.get("qr_code"),
+                "isReturnable": None if is_returnable is None else (1 if is_returnable else 0),
+                "dueDate": to_epoch(due_date) if isinstance(due_date, datetime) else due_date,
+                "updatedAt": datetime.utcnow().isoformat(),
+            }
             
             with self.db.get_transaction() as conn:
-                cursor = conn.execute(query, params)
+                cursor = conn.execute(UPDATE_CONTAINER_SQL, params)
+                rows = cursor.fetchall()  # the updated row when RETURNING is used
                 if cursor.rowcount == 0:
                     logger.warning(f"Container not found for update: {container_id}")
                     return None
             
             logger.info(f"Container updated: {container_id}")
-            return self.get_by_id(container_id)
+            if not rows:
+                return self.get_by_id(container_id)
+            row = rows[0]
+            return Container.from_row(row)
             
         except Exception as e:
             logger.error(f"Failed to update container {container_id}: {e}")
@@ -141,10 +263,7 @@ class ContainerCRUD:
         """Delete container by ID"""
         try:
             with self.db.get_transaction() as conn:
-                cursor = conn.execute(
-                    "DELETE FROM Container WHERE id = ?",
-                    (container_id,)
-                )
+                cursor = conn.execute(DELETE_CONTAINER_SQL, (container_id,))
                 
                 if cursor.rowcount > 0:
                     logger.info(f"Container deleted: {container_id}")
@@ -158,23 +277,12 @@ class ContainerCRUD:
     def get_all(self, limit: Optional[int] = None) -> List[Container]:
         """Get all containers with optional limit"""
         try:
-            query = "SELECT * FROM Container ORDER BY updatedAt DESC"
             if limit:
-                query += f" LIMIT {limit}"
-            
-            rows = self.db.fetchall(query)
-            
-            containers = []
-            for row in rows:
-                containers.append(Container(
-                    id=row["id"],
-                    qrCode=row["qrCode"],
-                    isReturnable=bool(row["isReturnable"]),
-                    dueDate=datetime.fromisoformat(row["dueDate"]) if row["dueDate"] else None,
-                    updatedAt=datetime.fromisoformat(row["updatedAt"])
-                ))
+                rows = self.db.fetchall(SELECT_CONTAINERS_LIMIT_SQL, (limit,))
+            else:
+                rows = self.db.fetchall(SELECT_CONTAINERS_SQL)
             
-            return containers
+            return [Container.from_row(row) for row in rows]
             
         except Exception as e:
             logger.error(f"Failed to get all containers: {e}")
@@ -183,35 +291,32 @@ class ContainerCRUD:
     def get_since(self, since: datetime, limit: Optional[int] = None) -> List[Container]:
         """Get containers updated since given datetime"""
         try:
-            query = "SELECT * FROM Container WHERE updatedAt > ? ORDER BY updatedAt DESC"
-            params = [since.isoformat()]
-            
             if limit:
-                query += f" LIMIT {limit}"
-            
-            rows = self.db.fetchall(query, params)
-            
-            containers = []
-            for row in rows:
-                containers.append(Container(
-                    id=row["id"],
-                    qrCode=row["qrCode"],
-                    isReturnable=bool(row["isReturnable"]),
-                    dueDate=datetime.fromisoformat(row["dueDate"]) if row["dueDate"] else None,
-                    updatedAt=datetime.fromisoformat(row["updatedAt"])
-                ))
+                rows = self.db.fetchall(SELECT_CONTAINERS_SINCE_LIMIT_SQL, (since.isoformat(), limit))
+            else:
+                rows = self.db.fetchall(SELECT_CONTAINERS_SINCE_SQL, (since.isoformat(),))
             
-            return containers
+            return [Container.from_row(row) for row in rows]
             
         except Exception as e:
             logger.error(f"Failed to get containers since {since}: {e}")
             raise DatabaseError(f"Container retrieval failed: {e}")
     
+    def iter_sync_rows_since(self, since: datetime) -> Iterator[sqlite3.Row]:
+        """Yield raw rows with the columns sent on sync, without building models"""
+        try:
+            cursor = self.db.execute_query(SELECT_CONTAINER_SYNC_ROWS_SQL, (since.isoformat(),))
+            yield from cursor
+            
+        except Exception as e:
+            logger.error(f"Failed to iterate containers since {since}: {e}")
+            raise DatabaseError(f"Container retrieval failed: {e}")
+    
     def delete_all(self) -> bool:
         """Delete all containers"""
         try:
             with self.db.get_transaction() as conn:
-                cursor = conn.execute("DELETE FROM Container")
+                cursor = conn.execute(DELETE_ALL_CONTAINERS_SQL)
                 logger.info(f"Deleted {cursor.rowcount} containers")
                 return True
                 
@@ -222,30 +327,80 @@ class ContainerCRUD:
     def create_with_id(self, container_id: str, container_data: ContainerCreate) -> Container:
         """Create a new container with specific ID"""
         try:
-            now = datetime.utcnow().isoformat()
+            now = datetime.utcnow()
             
             with self.db.get_transaction() as conn:
-                conn.execute("""
-                    INSERT INTO Container (id, qrCode, isReturnable, dueDate, updatedAt)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (
+                conn.execute(INSERT_CONTAINER_SQL, (
                     container_id,
                     container_data.qr_code,
                     1 if container_data.is_returnable else 0,
-                    container_data.due_date.isoformat() if container_data.due_date else None,
-                    now
+                    container_data.due_date,
+                    now.isoformat()
                 ))
             
             logger.debug(f"Container created with ID: {container_id}")
-            return self.get_by_id(container_id) # type: ignore
+            return Container(
+                id=container_id,
+                qr_code=container_data.qr_code,
+                is_returnable=container_data.is_returnable,
+                due_date=container_data.due_date,
+                updated_at=now
+            )
             
         except Exception as e:
             logger.error(f"Failed to create container with ID {container_id}: {e}")
             raise DatabaseError(f"Container creation failed: {e}")
+    
+    def upsert_many(self, rows: Sequence[Tuple[str, str, bool, Optional[int]]],
+                    delete_missing: bool = False, updated_at: Optional[datetime] = None) -> int:
+        """Insert or update containers given as (id, qr_code, is_returnable, due_date) rows,
+        due_date in UTC epoch seconds.
+        
+        Only rows whose values actually changed are rewritten. With delete_missing,
+        containers not present in rows are removed in the same transaction, giving
+        replace-all semantics without rewriting the whole table. updated_at stamps the
+        written rows (defaults to now).
+        """
+        try:
+            now = (updated_at or datetime.utcnow()).isoformat()
+            params = [
+                (container_id, qr_code, 1 if is_returnable else 0, due_date, now)
+                for container_id, qr_code, is_returnable, due_date in rows
+            ]
+            
+            with self.db.get_transaction() as conn:
+                if delete_missing:
+                    incoming_ids = {p[0] for p in params}
+                    stale_ids = [
+                        row[0] for row in conn.execute(SELECT_CONTAINER_IDS_SQL)
+                        if row[0] not in incoming_ids
+                    ]
+                    for start in range(0, len(stale_ids), MAX_SQL_VARIABLES):
+                        chunk = stale_ids[start:start + MAX_SQL_VARIABLES]
+                        placeholders = ",".join("?" * len(chunk))
+                        conn.execute(f"DELETE FROM Container WHERE id IN ({placeholders})", chunk)
+                    
+                    # A QR code moving to another container id would otherwise hit the UNIQUE constraint
+                    conn.executemany(DELETE_MOVED_QR_CODE_SQL, [(p[1], p[0]) for p in params])
+                
+                before = conn.total_changes
+                conn.executemany(UPSERT_CONTAINER_SQL, params)
+                written = conn.total_changes - before
+            
+            logger.debug(f"Upserted {written} of {len(params)} containers")
+            return written
+            
+        except Exception as e:
+            logger.error(f"Failed to upsert {len(rows)} containers: {e}")
+            raise DatabaseError(f"Container bulk upsert failed: {e}")
 
 
 class DeviceStatusCRUD:
-    """CRUD operations for DeviceStatus table"""
+    """CRUD operations for DeviceStatus table
+    
+    Every read goes to the database, so writes from other processes are always
+    seen; APIService caches the status for the length of one tick.
+    """
     
     def __init__(self, db: DatabaseConnection):
         self.db = db
@@ -253,64 +408,45 @@ class DeviceStatusCRUD:
     def get_status(self) -> Optional[DeviceStatus]:
         """Get current device status"""
         try:
-            row = self.db.fetchone("SELECT * FROM DeviceStatus WHERE id = 1")
-            
-            if row:
-                return DeviceStatus(
-                    id=row["id"],
-                    lastSyncAt=datetime.fromisoformat(row["lastSyncAt"]),
-                    lastSeenAt=datetime.fromisoformat(row["lastSeenAt"]),
-                    version=row["version"],
-                    updateFailures=row["updateFailures"],
-                    active=bool(row["active"]),
-                    isInSafeMode=bool(row["isInSafeMode"])
-                )
-            return None
+            row = self.db.fetchone(SELECT_DEVICE_STATUS_SQL)
+            return DeviceStatus.from_row(row) if row else None
             
         except Exception as e:
             logger.error(f"Failed to get device status: {e}")
             raise DatabaseError(f"Device status retrieval failed: {e}")
     
+    def get_status_flags(self) -> Optional[Tuple[bool, bool]]:
+        """Get (active, is_in_safe_mode) without building a DeviceStatus; None if there is no row"""
+        try:
+            row = self.db.fetchone(SELECT_DEVICE_STATUS_FLAGS_SQL)
+            return (bool(row[0]), bool(row[1])) if row else None
+            
+        except Exception as e:
+            logger.error(f"Failed to get device status flags: {e}")
+            raise DatabaseError(f"Device status retrieval failed: {e}")
+    
     def update_status(self, updates: DeviceStatusUpdate) -> Optional[DeviceStatus]:
         """Update device status with given fields"""
         try:
-            set_clauses = []
-            params = {}
-            
-            if updates.last_sync_at:
-                set_clauses.append("lastSyncAt = :lastSyncAt")
-                params["lastSyncAt"] = updates.last_sync_at.isoformat()
-            
-            if updates.last_seen_at:
-                set_clauses.append("lastSeenAt = :lastSeenAt")
-                params["lastSeenAt"] = updates.last_seen_at.isoformat()
-            
-            if updates.version:
-                set_clauses.append("version = :version")
-                params["version"] = updates.version
-            
-            if updates.update_failures is not None:
-                set_clauses.append("updateFailures = :updateFailures")
-                params["updateFailures"] = updates.update_failures
-            
-            if updates.active is not None:
-                set_clauses.append("active = :active")
-                params["active"] = 1 if updates.active else 0
-            
-            if updates.is_in_safe_mode is not None:
-                set_clauses.append("isInSafeMode = :isInSafeMode")
-                params["isInSafeMode"] = 1 if updates.is_in_safe_mode else 0
-            
-            if not set_clauses:
+            # Fields left as None keep their stored value
+            params = {
+                "lastSyncAt": updates.last_sync_at.isoformat() if updates.last_sync_at else None,
+                "lastSeenAt": updates.last_seen_at.isoformat() if updates.last_seen_at else None,
+                "version": updates.version or None,
+                "updateFailures": updates.update_failures,
+                "active": None if updates.active is None else (1 if updates.active else 0),
+                "isInSafeMode": None if updates.is_in_safe_mode is None else (1 if updates.is_in_safe_mode else 0),
+            }
+            
+            if all(value is None for value in params.values()):
                 return self.get_status()
             
-            query = f"UPDATE DeviceStatus SET {', '.join(set_clauses)} WHERE id = 1"
-            
             with self.db.get_transaction() as conn:
-                conn.execute(query, params)
+                rows = conn.execute(UPDATE_DEVICE_STATUS_SQL, params).fetchall()
             
             logger.info("Device status updated")
-            return self.get_status()
+            # The updated row comes back from RETURNING, so no second read is needed
+            return DeviceStatus.from_row(rows[0]) if rows else self.get_status()
             
         except Exception as e:
             logger.error(f"Failed to update device status: {e}")
@@ -318,12 +454,12 @@ class DeviceStatusCRUD:
     
     def update_sync_time(self) -> Optional[DeviceStatus]:
         """Update last sync time to current time"""
-        now = datetime.utcnow()
+        now = datetime.now(timezone.utc)
         return self.update_status(DeviceStatusUpdate(last_sync_at=now))
     
     def update_seen_time(self) -> Optional[DeviceStatus]:
         """Update last seen time to current time"""
-        now = datetime.utcnow()
+        now = datetime.now(timezone.utc)
         return self.update_status(DeviceStatusUpdate(last_seen_at=now))
 
 
@@ -336,119 +472,179 @@ class AuditLogCRUD:
     def create_log(self, log_data: AuditLogCreate) -> AuditLog:
         """Create a new audit log entry"""
         try:
-            log_id = str(uuid4())
-            now = datetime.utcnow().isoformat()
+            now = (log_data.created_at or datetime.utcnow()).isoformat()
             
             with self.db.get_transaction() as conn:
-                conn.execute("""
-                    INSERT INTO AuditLog (id, type, description, isOfflineAction, containerId, createdAt)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (
-                    log_id,
+                cursor = conn.execute(INSERT_AUDIT_LOG_RETURNING_SQL, (
+                    None,
                     log_data.type.value,
                     log_data.description,
                     log_data.is_offline_action,
                     log_data.container_id,
                     now
                 ))
+                rows = cursor.fetchall()
+                # OR IGNORE skips a row violating a constraint without an error; lastrowid
+                # then still holds the previous insert's id, so it must not be used
+                inserted = bool(rows) if HAS_RETURNING else cursor.rowcount == 1
+                if not inserted:
+                    raise DatabaseError("row rejected by a constraint")
+                log_id = cursor.lastrowid
             
             logger.debug(f"Audit log created: {log_id} - {log_data.type.value}")
-            return self.get_by_id(log_id) # type: ignore
+            if rows:
+                return AuditLog.from_row(rows[0])
+            log = self.get_by_id(log_id)
+            if log is None:
+                raise DatabaseError(f"audit log {log_id} not found after insert")
+            return log
             
         except Exception as e:
             logger.error(f"Failed to create audit log: {e}")
             raise DatabaseError(f"Audit log creation failed: {e}")
     
-    def get_by_id(self, log_id: str) -> Optional[AuditLog]:
-        """Get audit log by ID"""
+    def bulk_create_logs(self, logs: List[AuditLogCreate]) -> int:
+        """Create many audit log entries in a single transaction"""
+        return self.insert_rows(self._log_params(logs))
+    
+    def create_many(self, logs: Sequence[AuditLogCreate]) -> List[int]:
+        """Create many audit log entries in a single transaction and return their IDs.
+        
+        Rows skipped for violating a constraint get no ID, so the result can be
+        shorter than logs.
+        """
+        rows = self._log_params(logs)
+        if not rows:
+            return []
+        
         try:
-            row = self.db.fetchone(
-                "SELECT * FROM AuditLog WHERE id = ?",
-                (log_id,)
+            # Row by row so each id is the one SQLite actually assigned; the
+            # statement stays compiled in the connection's cache between rows
+            ids = []
+            with self.db.get_transaction() as conn:
+                for row in rows:
+                    cursor = conn.execute(INSERT_AUDIT_LOG_SQL, row)
+                    if cursor.rowcount == 1:
+                        ids.append(cursor.lastrowid)
+            
+            if len(ids) < len(rows):
+                logger.warning(f"Skipped {len(rows) - len(ids)} invalid audit log rows")
+            logger.debug(f"Created {len(ids)} audit logs")
+            return ids
+            
+        except Exception as e:
+            logger.error(f"Failed to create {len(rows)} audit logs: {e}")
+            raise DatabaseError(f"Audit log bulk creation failed: {e}")
+    
+    def _log_params(self, logs: Sequence[AuditLogCreate]) -> List[Tuple[None, str, str, bool, Optional[str], str]]:
+        """Build insert_rows parameters, with database-assigned IDs, for the given logs"""
+        now = datetime.utcnow().isoformat()
+        return [
+            (
+                None,
+                log_data.type.value,
+                log_data.description,
+                log_data.is_offline_action,
+                log_data.container_id,
+                log_data.created_at.isoformat() if log_data.created_at else now
             )
+            for log_data in logs
+        ]
+    
+    def insert_rows(self, rows: Sequence[Tuple[Optional[int], str, str, bool, Optional[str], str]]) -> int:
+        """Insert pre-built (id, type, description, isOfflineAction, containerId, createdAt) rows
+        in a single transaction, without building a model per entry. A None id is
+        assigned by the database.
+        
+        Rows violating a constraint are skipped rather than aborting the batch.
+        """
+        if not rows:
+            return 0
+        
+        try:
+            with self.db.get_transaction() as conn:
+                inserted = conn.executemany(INSERT_AUDIT_LOG_SQL, rows).rowcount
+            
+            if inserted < len(rows):
+                logger.warning(f"Skipped {len(rows) - inserted} invalid audit log rows")
+            logger.debug(f"Created {inserted} audit logs")
+            return inserted
+            
+        except Exception as e:
+            logger.error(f"Failed to create {len(rows)} audit logs: {e}")
+            raise DatabaseError(f"Audit log bulk creation failed: {e}")
+    
+    def get_by_id(self, log_id: int) -> Optional[AuditLog]:
+        """Get audit log by ID"""
+        try:
+            row = self.db.fetchone(SELECT_AUDIT_LOG_BY_ID_SQL, (log_id,))
             
             if row:
-                return AuditLog(
-                    id=row["id"],
-                    type=LogType(row["type"]),
-                    description=row["description"],
-                    isOfflineAction=bool(row["isOfflineAction"]),
-                    containerId=row["containerId"],
-                    createdAt=datetime.fromisoformat(row["createdAt"])
-                )
+                return AuditLog.from_row(row)
             return None
             
         except Exception as e:
             logger.error(f"Failed to get audit log by ID {log_id}: {e}")
             raise DatabaseError(f"Audit log retrieval failed: {e}")
     
-    def get_logs_since(self, since: datetime, limit: Optional[int] = None) -> List[AuditLog]:
-        """Get audit logs since given datetime"""
+    @staticmethod
+    def _stream_logs(cursor: sqlite3.Cursor) -> Iterator[AuditLog]:
+        """Build models from a cursor FETCH_BATCH_SIZE rows at a time"""
+        while True:
+            rows = cursor.fetchmany(FETCH_BATCH_SIZE)
+            if not rows:
+                return
+            yield from map(AuditLog.from_row, rows)
+    
+    def get_logs_since(self, since: datetime, limit: Optional[int] = None,
+                       syncable_only: bool = False) -> List[AuditLog]:
+        """Get audit logs since given datetime, optionally only container-linked ones.
+        
+        Use iter_logs_since for long ranges that do not need to be held in memory.
+        """
         try:
             if limit:
-                query = """
-                    SELECT * FROM AuditLog 
-                    WHERE createdAt >= ? 
-                    ORDER BY createdAt DESC
-                    LIMIT ?
-                """
-                rows = self.db.fetchall(query, (since.isoformat(), limit))
+                query = SELECT_SYNCABLE_AUDIT_LOGS_SINCE_LIMIT_SQL if syncable_only else SELECT_AUDIT_LOGS_SINCE_LIMIT_SQL
+                cursor = self.db.execute_query(query, (since.isoformat(), limit))
             else:
-                query = """
-                    SELECT * FROM AuditLog 
-                    WHERE createdAt >= ? 
-                    ORDER BY createdAt DESC
-                """
-                rows = self.db.fetchall(query, (since.isoformat(),))
-            
-            logs = []
-            for row in rows:
-                logs.append(AuditLog(
-                    id=row["id"],
-                    type=LogType(row["type"]),
-                    description=row["description"],
-                    isOfflineAction=bool(row["isOfflineAction"]),
-                    containerId=row["containerId"],
-                    createdAt=datetime.fromisoformat(row["createdAt"])
-                ))
-            
-            return logs
+                query = SELECT_SYNCABLE_AUDIT_LOGS_SINCE_SQL if syncable_only else SELECT_AUDIT_LOGS_SINCE_SQL
+                cursor = self.db.execute_query(query, (since.isoformat(),))
+            return list(self._stream_logs(cursor))
             
         except Exception as e:
             logger.error(f"Failed to get audit logs since {since}: {e}")
             raise DatabaseError(f"Audit log retrieval failed: {e}")
     
+    def iter_logs_since(self, since: datetime, syncable_only: bool = False) -> Iterator[AuditLog]:
+        """Yield audit logs since given datetime, holding at most one fetch batch in memory"""
+        try:
+            query = SELECT_SYNCABLE_AUDIT_LOGS_SINCE_SQL if syncable_only else SELECT_AUDIT_LOGS_SINCE_SQL
+            cursor = self.db.execute_query(query, (since.isoformat(),))
+            yield from self._stream_logs(cursor)
+            
+        except Exception as e:
+            logger.error(f"Failed to iterate audit logs since {since}: {e}")
+            raise DatabaseError(f"Audit log retrieval failed: {e}")
+    
+    def iter_sync_rows_since(self, since: datetime) -> Iterator[sqlite3.Row]:
+        """Yield raw rows of container-linked logs since given datetime, without building models"""
+        try:
+            cursor = self.db.execute_query(SELECT_AUDIT_LOG_SYNC_ROWS_SQL, (since.isoformat(),))
+            yield from cursor
+            
+        except Exception as e:
+            logger.error(f"Failed to iterate audit logs since {since}: {e}")
+            raise DatabaseError(f"Audit log retrieval failed: {e}")
+    
     def get_logs_by_type(self, log_type: LogType, limit: Optional[int] = None) -> List[AuditLog]:
         """Get audit logs by type"""
         try:
             if limit:
-                query = """
-                    SELECT * FROM AuditLog 
-                    WHERE type = ? 
-                    ORDER BY createdAt DESC
-                    LIMIT ?
-                """
-                rows = self.db.fetchall(query, (log_type.value, limit))
+                rows = self.db.fetchall(SELECT_AUDIT_LOGS_BY_TYPE_LIMIT_SQL, (log_type.value, limit))
             else:
-                query = """
-                    SELECT * FROM AuditLog 
-                    WHERE type = ? 
-                    ORDER BY createdAt DESC
-                """
-                rows = self.db.fetchall(query, (log_type.value,))
-            
-            logs = []
-            for row in rows:
-                logs.append(AuditLog(
-                    id=row["id"],
-                    type=LogType(row["type"]),
-                    description=row["description"],
-                    isOfflineAction=bool(row["isOfflineAction"]),
-                    containerId=row["containerId"],
-                    createdAt=datetime.fromisoformat(row["createdAt"])
-                ))
+                rows = self.db.fetchall(SELECT_AUDIT_LOGS_BY_TYPE_SQL, (log_type.value,))
             
-            return logs
+            return [AuditLog.from_row(row) for row in rows]
             
         except Exception as e:
             logger.error(f"Failed to get audit logs by type {log_type}: {e}")
@@ -458,10 +654,7 @@ class AuditLogCRUD:
         """Delete audit logs before given datetime"""
         try:
             with self.db.get_transaction() as conn:
-                cursor = conn.execute(
-                    "DELETE FROM AuditLog WHERE createdAt < ?",
-                    (before.isoformat(),)
-                )
+                cursor = conn.execute(DELETE_AUDIT_LOGS_BEFORE_SQL, (before.isoformat(),))
                 
                 deleted_count = cursor.rowcount
                 logger.info(f"Deleted {deleted_count} audit logs before {before}")
@@ -471,14 +664,25 @@ class AuditLogCRUD:
             logger.error(f"Failed to delete audit logs before {before}: {e}")
             raise DatabaseError(f"Audit log deletion failed: {e}")
     
-    def delete_log(self, log_id: str) -> bool:
+    def delete_unsyncable_before(self, before: datetime) -> int:
+        """Delete audit logs without a container (never synced) before given datetime"""
+        try:
+            with self.db.get_transaction() as conn:
+                cursor = conn.execute(DELETE_UNSYNCABLE_AUDIT_LOGS_BEFORE_SQL, (before.isoformat(),))
+                
+                deleted_count = cursor.rowcount
+                logger.debug(f"Deleted {deleted_count} unsyncable audit logs before {before}")
+                return deleted_count
+                
+        except Exception as e:
+            logger.error(f"Failed to delete unsyncable audit logs before {before}: {e}")
+            raise DatabaseError(f"Audit log deletion failed: {e}")
+    
+    def delete_log(self, log_id: int) -> bool:
         """Delete audit log by ID"""
         try:
             with self.db.get_transaction() as conn:
-                cursor = conn.execute(
-                    "DELETE FROM AuditLog WHERE id = ?",
-                    (log_id,)
-                )
+                cursor = conn.execute(DELETE_AUDIT_LOG_SQL, (log_id,))
                 
                 if cursor.rowcount > 0:
                     logger.debug(f"Audit log deleted: {log_id}")
@@ -491,11 +695,35 @@ class AuditLogCRUD:
             logger.error(f"Failed to delete audit log {log_id}: {e}")
             raise DatabaseError(f"Audit log deletion failed: {e}")
     
+    def delete_many(self, log_ids: List[int]) -> int:
+        """Delete audit logs by ID in a single transaction"""
+        if not log_ids:
+            return 0
+        
+        try:
+            deleted_count = 0
+            with self.db.get_transaction() as conn:
+                for start in range(0, len(log_ids), MAX_SQL_VARIABLES):
+                    chunk = log_ids[start:start + MAX_SQL_VARIABLES]
+                    placeholders = ",".join("?" * len(chunk))
+                    cursor = conn.execute(
+                        f"DELETE FROM AuditLog WHERE id IN ({placeholders})",
+                        chunk
+                    )
+                    deleted_count += cursor.rowcount
+            
+            logger.debug(f"Deleted {deleted_count} audit logs")
+            return deleted_count
+            
+        except Exception as e:
+            logger.error(f"Failed to delete {len(log_ids)} audit logs: {e}")
+            raise DatabaseError(f"Audit log bulk deletion failed: {e}")
+    
     def delete_all(self) -> bool:
         """Delete all audit logs"""
         try:
             with self.db.get_transaction() as conn:
-                cursor = conn.execute("DELETE FROM AuditLog")
+                cursor = conn.execute(DELETE_ALL_AUDIT_LOGS_SQL)
                 logger.info(f"Deleted {cursor.rowcount} audit logs")
                 return True
                 
@@ -2,12 +2,12 @@
 Database models for the Container Return System
 """
 
-from datetime import datetime
+import os
+from dataclasses import dataclass, field, fields
+from datetime import datetime, timezone
 from enum import Enum
-from typing import Optional
-from uuid import UUID, uuid4
-
-from pydantic import BaseModel, Field
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
 
 
 class LogType(str, Enum):
@@ -18,63 +18,142 @@ class LogType(str, Enum):
     RETURN_INVALID = "RETURN_INVALID"
 
 
-class Container(BaseModel):
+@lru_cache(maxsize=4096)
+def parse_iso(value: str) -> datetime:
+    """Parse a stored ISO timestamp; memoized since rows written together share values"""
+    return datetime.fromisoformat(value)
+
+
+def parse_utc(value: str) -> datetime:
+    """Parse a stored timestamp, treating legacy naive values as UTC"""
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+def to_epoch(dt: datetime) -> int:
+    """Whole UTC epoch seconds for a datetime, treating naive values as UTC"""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+def from_epoch(ts: int) -> datetime:
+    """Aware UTC datetime for stored epoch seconds"""
+    return datetime.fromtimestamp(ts, timezone.utc)
+
+
+# RFC 4122 variant digit for each random hex digit (top two bits forced to 10)
+_UUID_VARIANT_DIGITS = "89ab" * 4
+
+# IDs generated ahead for new_id(), refilled ID_POOL_SIZE at a time
+ID_POOL_SIZE = 256
+_id_pool: List[str] = []
+
+
+def uuid_batch(n: int) -> List[str]:
+    """Generate n random (version 4) UUID strings from a single os.urandom call"""
+    h = os.urandom(16 * n).hex()
+    return [
+        f"{h[i:i + 8]}-{h[i + 8:i + 12]}-4{h[i + 13:i + 16]}-"
+        f"{_UUID_VARIANT_DIGITS[int(h[i + 16], 16)]}{h[i + 17:i + 20]}-{h[i + 20:i + 32]}"
+        for i in range(0, 32 * n, 32)
+    ]
+
+
+def new_id() -> str:
+    """A new random UUID string, taken from a pool filled by uuid_batch"""
+    try:
+        return _id_pool.pop()
+    except IndexError:
+        # Concurrent refills only over-fill the pool; pop and extend are atomic
+        _id_pool.extend(uuid_batch(ID_POOL_SIZE))
+        return _id_pool.pop()
+
+
+class _Record:
+    """Shared helpers for the model dataclasses.
+
+    The models are plain slotted dataclasses: they only carry rows between SQL
+    and the application, so they are built without validation. Rows read back
+    from our own database go through from_row, which passes the columns
+    positionally in field declaration order. Field names are
+    snake_case only; the server's camelCase names are mapped in api.serializers.
+    """
+
+    __slots__ = ()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Field values as a dict"""
+        return {name: getattr(self, name) for name in field_names(type(self))}
+
+
+@lru_cache(maxsize=None)
+def field_names(cls: type) -> Tuple[str, ...]:
+    """Dataclass field names of a model, in declaration order"""
+    return tuple(f.name for f in fields(cls))
+
+
+@dataclass(slots=True)
+class Container(_Record):
     """Container model for database operations"""
-    id: str = Field(default_factory=lambda: str(uuid4()))
-    qr_code: str = Field(..., alias="qrCode")
-    is_returnable: bool = Field(..., alias="isReturnable")
-    due_date: Optional[datetime] = Field(None, alias="dueDate")
-    updated_at: datetime = Field(default_factory=datetime.utcnow, alias="updatedAt")
+    qr_code: str
+    is_returnable: bool
+    due_date: Optional[int] = None  # UTC epoch seconds
+    id: str = field(default_factory=new_id)
+    updated_at: datetime = field(default_factory=datetime.utcnow)
 
-    class Config:
-        populate_by_name = True
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
+    @classmethod
+    def from_row(cls, row) -> 'Container':
+        """Build from a (id, qrCode, isReturnable, dueDate, updatedAt) row"""
+        return cls(row[1], bool(row[2]), row[3], row[0], parse_iso(row[4]))
 
 
-class DeviceStatus(BaseModel):
+@dataclass(slots=True)
+class DeviceStatus(_Record):
     """Device status model for database operations"""
-    id: int = Field(default=1)
-    last_sync_at: datetime = Field(..., alias="lastSyncAt")
-    last_seen_at: datetime = Field(..., alias="lastSeenAt")
+    last_sync_at: datetime
+    last_seen_at: datetime
     version: str
-    update_failures: int = Field(default=0, alias="updateFailures")
-    active: bool = Field(default=True)
-    is_in_safe_mode: bool = Field(default=False, alias="isInSafeMode")
+    id: int = 1
+    update_failures: int = 0
+    active: bool = True
+    is_in_safe_mode: bool = False
 
-    class Config:
-        populate_by_name = True
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
+    @classmethod
+    def from_row(cls, row) -> 'DeviceStatus':
+        """Build from a (id, lastSyncAt, lastSeenAt, version, updateFailures, active, isInSafeMode) row"""
+        return cls(parse_utc(row[1]), parse_utc(row[2]), row[3], row[0], row[4], bool(row[5]), bool(row[6]))
 
 
-class AuditLog(BaseModel):
+@dataclass(slots=True)
+class AuditLog(_Record):
     """Audit log model for database operations"""
-    id: str = Field(default_factory=lambda: str(uuid4()))
     type: LogType
     description: str
-    is_offline_action: bool = Field(..., alias="isOfflineAction")
-    container_id: Optional[str] = Field(None, alias="containerId")
-    created_at: datetime = Field(default_factory=datetime.utcnow, alias="createdAt")
+    is_offline_action: bool
+    container_id: Optional[str] = None
+    id: Optional[int] = None  # assigned by the database on insert
+    created_at: datetime = field(default_factory=datetime.utcnow)
 
-    class Config:
-        populate_by_name = True
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
+    @classmethod
+    def from_row(cls, row) -> 'AuditLog':
+        """Build from a (id, type, description, isOfflineAction, containerId, createdAt) row"""
+        return cls(LogType(row[1]), row[2], bool(row[3]), row[4], row[0], parse_iso(row[5]))
 
 
 # Database creation models (for raw SQL operations)
-class ContainerCreate(BaseModel):
+@dataclass(slots=True)
+class ContainerCreate:
     """Model for creating new containers"""
     qr_code: str
     is_returnable: bool
-    due_date: Optional[datetime] = None
+    due_date: Optional[int] = None  # UTC epoch seconds
 
 
-class DeviceStatusUpdate(BaseModel):
+@dataclass(slots=True)
+class DeviceStatusUpdate:
     """Model for updating device status"""
     last_sync_at: Optional[datetime] = None
     last_seen_at: Optional[datetime] = None
@@ -84,9 +163,11 @@ class DeviceStatusUpdate(BaseModel):
     is_in_safe_mode: Optional[bool] = None
 
 
-class AuditLogCreate(BaseModel):
+@dataclass(slots=True)
+class AuditLogCreate:
     """Model for creating audit logs"""
     type: LogType
     description: str
     is_offline_action: bool
-    container_id: Optional[str] = None 
\ No newline at end of file
+    container_id: Optional[str] = None
+    created_at: Optional[datetime] = None  # defaults to insert time
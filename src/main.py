@@ -6,22 +6,61 @@ Simple initialization and execution.
 """
 
 import argparse
+import enum
 import logging
 import os
+import queue
+import selectors
 import signal
+import socket
 import sys
 import time
-from typing import Optional
-from .config.config_manager import get_config, ConfigManager
+from typing import TYPE_CHECKING, Optional, Tuple
+from .config.config_manager import get_config, load_environment, ConfigManager
 from .config.logging_config import setup_logging
 from .config.validator import validate_config
-from .database.connection import get_database, DatabaseError
-from .database.crud import DatabaseManager
-from .audit.logger import initialize_audit_logger, AuditLogger
-from .uart.uart import UART
-from .qr.scanner import QRScanner
-from .qr.processor import QRProcessor
-from .api.service import APIService
+
+# The database, UART, QR and API stacks are imported by the initializers that
+# first need them, so --check-config does not load serial, evdev or requests
+if TYPE_CHECKING:
+    from .database.crud import DatabaseManager
+    from .audit.logger import AuditLogger
+    from .uart.uart import UART
+    from .qr.scanner import QRScanner
+    from .qr.processor import QRProcessor, ValidationResult
+    from .api.service import APIService
+
+# Longest the main loop sleeps; scanner hand-off and API timers are still polled
+MAIN_LOOP_INTERVAL = 1.0
+# Seconds between device last-seen updates
+SEEN_TIME_INTERVAL = 300.0
+# Loopback UDP address dev/test tools send QR codes to when no evdev scanner is
+# present; UDP rather than a Unix socket so it also works on Windows dev machines
+QR_FALLBACK_ADDRESS = ("127.0.0.1", 47123)
+
+
+class DeviceLock(enum.IntFlag):
+    """Why the device is locked down; any set reason keeps it locked"""
+    NONE = 0
+    INACTIVE = 1  # server reports the device inactive
+    SECURE = 2    # server unreachable for too long
+
+
+# (reason, locking) -> (log level, log message, cause for hardware/QR log lines, audit message)
+_LOCK_MESSAGES = {
+    (DeviceLock.INACTIVE, True): (
+        logging.WARNING, "Entering inactive mode - device is not active",
+        "due to inactive status", "Device entered inactive mode - all operations suspended"),
+    (DeviceLock.INACTIVE, False): (
+        logging.INFO, "Exiting inactive mode - device is now active",
+        "- device is active", "Device exited inactive mode - normal operations resumed"),
+    (DeviceLock.SECURE, True): (
+        logging.WARNING, "Entering secure mode - server disconnected for 2+ days",
+        "due to secure mode", "Device entered secure mode - server disconnected for 2+ days"),
+    (DeviceLock.SECURE, False): (
+        logging.INFO, "Exiting secure mode - server connection restored",
+        "- exiting secure mode", "Device exited secure mode - server connection restored"),
+}
 
 
 class ContainerReturnSystem:
@@ -29,26 +68,94 @@ class ContainerReturnSystem:
     
     def __init__(self) -> None:
         self.config: Optional[ConfigManager] = None
-        self.logger: Optional[logging.Logger] = None
-        self.audit_logger: Optional[AuditLogger] = None
-        self.db_manager: Optional[DatabaseManager] = None
-        self.uart_manager: Optional[UART] = None
-        self.qr_scanner: Optional[QRScanner] = None
-        self.qr_processor: Optional[QRProcessor] = None
-        self.api_service: Optional[APIService] = None
+        # Silent until setup_logging configures handlers, so log calls need no guard
+        self.logger: logging.Logger = logging.getLogger(__name__)
+        self.logger.addHandler(logging.NullHandler())
+        self.audit_logger: Optional['AuditLogger'] = None
+        self.db_manager: Optional['DatabaseManager'] = None
+        self.uart_manager: Optional['UART'] = None
+        self.qr_scanner: Optional['QRScanner'] = None
+        self.qr_processor: Optional['QRProcessor'] = None
+        self.api_service: Optional['APIService'] = None
         self.shutdown_requested: bool = False
-        self.device_inactive: bool = False  # Track device inactive state
-        self.device_secure_mode: bool = False  # Track secure mode state
+        self._shutdown_signal: Optional[int] = None  # Signal that requested shutdown, if any
+        self._lock: DeviceLock = DeviceLock.NONE  # Reasons the device is locked down
+        # Self-pipe written on signals so a sleeping main loop wakes at once
+        self._wakeup_reader, self._wakeup_writer = socket.socketpair()
+        self._wakeup_reader.setblocking(False)
+        self._wakeup_writer.setblocking(False)
+        # Receives QR codes for dev/testing when there is no scanner
+        self._qr_socket: Optional[socket.socket] = None
+        # Lock changes reported by API callbacks on other threads, applied by the main
+        # loop so all UART writes and scanner toggles happen on one thread
+        self._lock_changes: "queue.SimpleQueue[Tuple[DeviceLock, bool]]" = queue.SimpleQueue()
+    
+    @property
+    def device_inactive(self) -> bool:
+        """Whether the server has marked the device inactive"""
+        return bool(self._lock & DeviceLock.INACTIVE)
+    
+    @property
+    def device_secure_mode(self) -> bool:
+        """Whether the device is in secure mode after losing the server"""
+        return bool(self._lock & DeviceLock.SECURE)
     
     def setup_signal_handlers(self) -> None:
         """Setup signal handlers for graceful shutdown"""
         def signal_handler(signum, frame):
-            _ = signum, frame  # Unused parameters
-            print("Shutdown signal received...")
+            # Only record the request: the wakeup fd already interrupts the main
+            # loop's select, and it reports the signal outside handler context
+            _ = frame  # Unused parameter
+            self._shutdown_signal = signum
             self.shutdown_requested = True
         
         signal.signal(signal.SIGINT, signal_handler)
         signal.signal(signal.SIGTERM, signal_handler)
+        signal.set_wakeup_fd(self._wakeup_writer.fileno(), warn_on_full_buffer=False)
+    
+    def wake(self) -> None:
+        """Wake the main loop early (safe to call from any thread)"""
+        try:
+            self._wakeup_writer.send(b'\0')
+        except (BlockingIOError, OSError):
+            pass  # A wakeup is already pending
+    
+    def _open_qr_fallback_socket(self) -> None:
+        """Listen for QR codes from dev/test tools on a loopback UDP socket"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.bind(QR_FALLBACK_ADDRESS)
+        except OSError as e:
+            sock.close()
+            self.logger.warning(f"QR fallback socket not available: {e}")
+            return
+        sock.setblocking(False)
+        self._qr_socket = sock
+        host, port = QR_FALLBACK_ADDRESS
+        self.logger.info(f"QR codes can still be sent as UDP datagrams to {host}:{port} for testing")
+    
+    def _build_selector(self) -> selectors.BaseSelector:
+        """Selector over the wakeup socket and, when it has one, the UART port"""
+        selector = selectors.DefaultSelector()
+        selector.register(self._wakeup_reader, selectors.EVENT_READ)
+        if self._qr_socket is not None:
+            selector.register(self._qr_socket, selectors.EVENT_READ)
+        serial_connection = self.uart_manager.serial_connection if self.uart_manager else None
+        if serial_connection is not None:
+            try:
+                selector.register(serial_connection.fileno(), selectors.EVENT_READ)
+            except (AttributeError, OSError, ValueError) as e:
+                # Ports without a pollable descriptor are still read every interval
+                self.logger.debug(f"UART port not selectable, polling instead: {e}")
+        return selector
+    
+    def _drain_wakeups(self) -> None:
+        """Discard pending wakeup bytes"""
+        try:
+            while self._wakeup_reader.recv(512):
+                pass
+        except (BlockingIOError, OSError):
+            pass
     
     def load_configuration(self, debug: bool = False) -> None:
         """Load application configuration"""
@@ -79,24 +186,25 @@ class ContainerReturnSystem:
             "debug": self.config.debug
         }
         setup_logging(log_config)
-        self.logger = logging.getLogger(__name__)
         
-        if self.logger:
-            self.logger.info("Logging system initialized")
+        self.logger.info("Logging system initialized")
     
     def initialize_database(self) -> None:
         """Initialize database"""
         if not self.config:
             raise RuntimeError("Configuration not loaded")
         
+        from .database.connection import get_database, DatabaseError
+        from .database.crud import DatabaseManager
+        from .audit.logger import initialize_audit_logger
+        
         try:
             db = get_database(self.config.database_url)
             self.db_manager = DatabaseManager(db)
             self.db_manager.initialize()
             self.audit_logger = initialize_audit_logger(db)
             
-            if self.logger:
-                self.logger.info("Database initialized")
+            self.logger.info("Database initialized")
                 
         except DatabaseError as e:
             print(f"Database error: {e}")
@@ -108,16 +216,18 @@ class ContainerReturnSystem:
             if not self.config:
                 raise RuntimeError("Configuration not loaded")
             
+            from .uart.uart import UART
+            
             self.uart_manager = UART(
                 port=self.config.uart_port,
                 baudrate=self.config.uart_baudrate,
                 db_manager=self.db_manager,
-                debug_mode=self.config.debug
+                debug_mode=self.config.debug,
+                low_latency=self.config.uart_low_latency
             )
             
             if self.uart_manager.start():
-                if self.logger:
-                    self.logger.info("UART initialized")
+                self.logger.info("UART initialized")
             else:
                 raise RuntimeError("Failed to start UART")
                 
@@ -127,9 +237,15 @@ class ContainerReturnSystem:
     
     def initialize_components(self) -> None:
         """Initialize all system components"""
+        # Bound module-wide once here, for _handle_qr_scan, which only runs after this
+        global ValidationResult
         try:
+            from .qr.scanner import QRScanner
+            from .qr.processor import QRProcessor, ValidationResult
+            from .api.service import APIService
+            
             # Initialize core components
-            self.qr_processor = QRProcessor(self.db_manager)
+            self.qr_processor = QRProcessor(self.db_manager, regex_parse=self.config.qr_regex_parse)
 
             # Try to initialize QR scanner (requires evdev on Linux)
             try:
@@ -144,14 +260,12 @@ class ContainerReturnSystem:
                     self.qr_scanner.add_scan_callback(self._handle_qr_scan)
                     self.qr_scanner.start_scanning()
 
-                if self.logger:
-                    self.logger.info("QR scanner initialized successfully")
+                self.logger.info("QR scanner initialized successfully")
             except RuntimeError as e:
                 # QR scanner not available (likely Windows/dev environment)
                 self.qr_scanner = None
-                if self.logger:
-                    self.logger.warning(f"QR scanner not available: {e}")
-                    self.logger.info("QR file-based scanning will still work for testing")
+                self.logger.warning(f"QR scanner not available: {e}")
+                self._open_qr_fallback_socket()
             
             # Initialize API service
             if self.config and self.db_manager:
@@ -170,90 +284,106 @@ class ContainerReturnSystem:
                 if self.qr_processor:
                     self.uart_manager.qr_processor = self.qr_processor
                 # Set device inactive callback
-                self.uart_manager.set_device_inactive_callback(lambda: self.device_inactive or self.device_secure_mode)
+                self.uart_manager.set_device_inactive_callback(lambda: bool(self._lock))
             
             # UART initialization complete
             
-            # Check initial device status and set inactive mode if needed
-            self._initialize_device_status()
+            # Enter inactive and/or secure mode if the stored device status says so
+            self._initialize_mode_from_status()
             
-            # Check initial secure mode status
-            self._initialize_secure_mode_status()
-            
-            if self.logger:
-                self.logger.info("All components initialized")
+            self.logger.info("All components initialized")
                 
         except Exception as e:
-            if self.logger:
-                self.logger.error(f"Component initialization failed: {e}")
+            self.logger.error(f"Component initialization failed: {e}")
             sys.exit(1)
     
     def run_main_loop(self) -> None:
         """Simple main application loop"""
-        if self.logger:
-            self.logger.info("Starting main loop")
-        
-        loop_counter = 0
+        self.logger.info("Starting main loop")
+        
+        selector = self._build_selector()
+        next_seen_update = time.monotonic()
+        
+        # Components are fixed once initialized; bind them (and the loop's
+        # callables) to locals so each iteration skips the attribute lookups
+        process_uart = self.uart_manager.process_messages if self.uart_manager else None
+        run_api_checks = self.api_service.check_and_run if self.api_service else None
+        check_qr = (self.qr_scanner.check_for_scans if self.qr_scanner
+                    else self._check_qr_fallback)
+        # With an API service the last-seen write joins the tick's other status changes
+        if self.api_service:
+            record_seen = self.api_service.record_seen_time
+        elif self.db_manager:
+            record_seen = self.db_manager.device_status.update_seen_time
+        else:
+            record_seen = None
+        apply_lock_changes = self._apply_lock_changes
+        drain_wakeups = self._drain_wakeups
+        select = selector.select
+        monotonic = time.monotonic
         
         while not self.shutdown_requested:
             try:
                 # Process UART messages and handle sequences
-                if self.uart_manager:
-                    self.uart_manager.process_messages()
+                if process_uart is not None:
+                    process_uart()
+                
+                # Update device status every 300 seconds
+                now = monotonic()
+                if now >= next_seen_update:
+                    if record_seen is not None:
+                        record_seen()
+                    next_seen_update = now + SEEN_TIME_INTERVAL
                 
                 # Check API operations (healthcheck and sync)
-                if self.api_service:
-                    self.api_service.check_and_run()
+                if run_api_checks is not None:
+                    run_api_checks()
                 
-                # QR scanner uses evdev HID device access with file-based communication
-                # check_for_scans() reads from file and handles timeouts
-                if self.qr_scanner:
-                    self.qr_scanner.check_for_scans()
-                else:
-                    # Fallback: directly check QR file for testing without evdev
-                    self._check_qr_file_fallback()
+                # Lock down or release the hardware for status changes reported meanwhile
+                apply_lock_changes()
                 
-                # Update device status every 300 seconds
-                if self.db_manager and loop_counter % 300 == 0:
-                    self.db_manager.device_status.update_seen_time()
+                # QR scanner uses evdev HID device access with file-based communication;
+                # without it, take submitted QR codes for testing
+                check_qr()
                 
-                # Simple loop with 1 second interval
-                time.sleep(1)
-                loop_counter += 1
+                # Sleep until UART data, a signal, or the next periodic check
+                timeout = min(MAIN_LOOP_INTERVAL, max(0.0, next_seen_update - monotonic()))
+                if select(timeout):
+                    drain_wakeups()
                 
             except KeyboardInterrupt:
                 self.shutdown_requested = True
                 break
             except Exception as e:
-                if self.logger:
-                    self.logger.error(f"Main loop error: {e}")
+                self.logger.error(f"Main loop error: {e}")
                 break
         
-        if self.logger:
-            self.logger.info("Main loop ended")
+        selector.close()
+        
+        if self._shutdown_signal is not None:
+            print(f"Shutdown signal received ({signal.Signals(self._shutdown_signal).name})...")
+        
+        self.logger.info("Main loop ended")
     
     def reset_system(self) -> None:
         """Reset system to idle state"""
         if self.uart_manager:
             self.uart_manager.reset_to_idle()
         
-        if self.logger:
-            self.logger.info("System reset to idle state")
+        self.logger.info("System reset to idle state")
     
     def _handle_qr_scan(self, scan_event) -> None:
         """Handle QR code scan event from USB scanner (non-sequence cases only)."""
         try:
-            if self.logger:
-                self.logger.info(f"QR code scanned outside sequence: {scan_event.qr_code}")
+            self.logger.info(f"QR code scanned outside sequence: {scan_event.qr_code}")
             
             # Process for debugging/testing when not in sequence
             if self.qr_processor:
                 result = self.qr_processor.process_qr_code(scan_event.qr_code)
                 
                 # Check for fraud attempts
-                if result.is_fraud_attempt or result.validation.value == "fraud_attempt":
-                    if self.logger:
-                        self.logger.warning(f"Fraud attempt detected: {result.error_message}")
+                if result.is_fraud_attempt or result.validation is ValidationResult.FRAUD_ATTEMPT:
+                    self.logger.warning(f"Fraud attempt detected: {result.error_message}")
                     # Log fraud attempt to audit system
                     if self.audit_logger:
                         self.audit_logger.log_security_event(
@@ -265,29 +395,28 @@ class ContainerReturnSystem:
                                 "error": result.error_message
                             }
                         )
-                elif result.validation.value == "valid" and result.container_id:
-                    if self.logger:
-                        self.logger.info(f"Valid container scanned: {result.container_id}")
+                elif result.validation is ValidationResult.VALID and result.container_id:
+                    self.logger.info(f"Valid container scanned: {result.container_id}")
                 else:
-                    if self.logger:
-                        self.logger.warning(f"Invalid QR code: {result.error_message}")
+                    self.logger.warning(f"Invalid QR code: {result.error_message}")
             
         except Exception as e:
-            if self.logger:
-                self.logger.error(f"Error handling QR scan: {e}")
+            self.logger.error(f"Error handling QR scan: {e}")
 
-    def _check_qr_file_fallback(self) -> None:
-        """Simple QR file check for dev/testing without evdev."""
+    def _check_qr_fallback(self) -> None:
+        """Process QR codes sent to the fallback socket for dev/testing without evdev."""
+        if self._qr_socket is None:
+            return
         try:
-            from pathlib import Path
-            qr_file = Path("qr_scan_data.txt")
-            if qr_file.exists():
-                qr_code = qr_file.read_text().strip()
-                qr_file.unlink()
+            while True:
+                try:
+                    data = self._qr_socket.recv(4096)
+                except (BlockingIOError, InterruptedError):
+                    return
+                qr_code = data.decode('utf-8', errors='replace').strip()
                 if qr_code and self.qr_processor:
                     result = self.qr_processor.process_qr_code(qr_code)
-                    if self.logger:
-                        self.logger.info(f"QR: {qr_code} -> {result.validation.value}")
+                    self.logger.info(f"QR: {qr_code} -> {result.validation.value}")
                     # Pass to UART if waiting
                     if self.uart_manager and self.uart_manager._waiting_for_qr:
                         self.uart_manager._container_qr_code = qr_code
@@ -308,13 +437,24 @@ class ContainerReturnSystem:
         if self.uart_manager:
             self.uart_manager.stop()
         
+        if self.api_service:
+            self.api_service.close()
+        
         if self.audit_logger:
             self.audit_logger.log_system_shutdown("Normal shutdown")
+            self.audit_logger.close()
+        
+        signal.set_wakeup_fd(-1)
+        if self._qr_socket is not None:
+            self._qr_socket.close()
+        self._wakeup_reader.close()
+        self._wakeup_writer.close()
         
         print("Shutdown complete")
     
     def print_config(self) -> None:
         """Print current environment variables and configuration"""
+        load_environment()
         print("=== Container Return System Configuration ===")
         print()
         
@@ -380,217 +520,136 @@ class ContainerReturnSystem:
         Args:
             active: True if device is active, False if inactive
         """
-        if self.logger:
-            self.logger.info(f"Device status change: active={active}")
+        self.logger.info(f"Device status change: active={active}")
+        self._queue_lock_change(DeviceLock.INACTIVE, not active)
+    
+    def _on_secure_mode_change(self, secure_mode: bool) -> None:
+        """Handle secure mode status change from API service.
         
-        if not active:
-            # Device became inactive - enter inactive mode
-            self._enter_inactive_mode()
-        else:
-            # Device became active - exit inactive mode
-            self._exit_inactive_mode()
+        Args:
+            secure_mode: True if device should be in secure mode, False otherwise
+        """
+        self.logger.info(f"Secure mode status change: secure_mode={secure_mode}")
+        self._queue_lock_change(DeviceLock.SECURE, secure_mode)
+    
+    def _queue_lock_change(self, reason: DeviceLock, locked: bool) -> None:
+        """Hand a lock change to the main loop (safe to call from any thread)"""
+        self._lock_changes.put((reason, locked))
+        self.wake()
+    
+    def _apply_lock_changes(self) -> None:
+        """Apply queued lock changes in the order they were reported"""
+        while True:
+            try:
+                reason, locked = self._lock_changes.get_nowait()
+            except queue.Empty:
+                return
+            self._set_lock(reason, locked)
     
-    def _enter_inactive_mode(self) -> None:
-        """Enter inactive mode: turn all lights red and stop message processing."""
-        if self.logger:
-            self.logger.warning("Entering inactive mode - device is not active")
+    def _set_lock(self, reason: DeviceLock, locked: bool) -> None:
+        """Set or clear one lock reason and run the hardware transition it causes.
+        
+        The hardware is only locked when the first reason is set and unlocked
+        when the last one clears, so inactive and secure mode can overlap.
+        """
+        level, message, cause, audit_message = _LOCK_MESSAGES[(reason, locked)]
+        self.logger.log(level, message)
         
-        self.device_inactive = True
+        was_locked = bool(self._lock)
+        self._lock = self._lock | reason if locked else self._lock & ~reason
+        actions = self._LOCK_TRANSITIONS.get((was_locked, bool(self._lock)), ())
+        if not locked and self._lock:
+            self.logger.info(f"Device still in {self._lock.name.lower()} mode - keeping restrictions in place")
+        for action in actions:
+            action(self, cause)
         
-        # Turn all lights red and block doors
+        if self.audit_logger:
+            self.audit_logger.log_info(audit_message)
+    
+    def _lock_hardware(self, cause: str) -> None:
+        """Turn all lights red, block doors and stop QR scanning."""
         if self.uart_manager:
             try:
-                self.logger.info("Setting all lights to red and blocking doors due to inactive status") if self.logger else None
-                # Set both cover and container lights to red
-                self.uart_manager.set_cover_light_red()
-                self.uart_manager.set_container_light_red()
-                # Block doors
-                self.uart_manager.block_doors()
+                self.logger.info(f"Setting all lights to red and blocking doors {cause}")
+                # Both lights red and doors blocked, sent as one burst
+                self.uart_manager.enter_locked_state()
             except Exception as e:
-                if self.logger:
-                    self.logger.error(f"Failed to set red lights and block doors: {e}")
+                self.logger.error(f"Failed to set red lights and block doors {cause}: {e}")
         
-        # Disable QR scanning
         if self.qr_scanner:
             self.qr_scanner.disable_scanning()
-            if self.logger:
-                self.logger.info("QR scanning disabled due to inactive status")
-        
-        # Log audit event
-        if self.audit_logger:
-            self.audit_logger.log_info("Device entered inactive mode - all operations suspended")
+            self.logger.info(f"QR scanning disabled {cause}")
     
-    def _exit_inactive_mode(self) -> None:
-        """Exit inactive mode: turn off lights and resume normal operation."""
-        if self.logger:
-            self.logger.info("Exiting inactive mode - device is now active")
-        
-        self.device_inactive = False
-        
-        # Turn off all lights and unblock doors
+    def _unlock_hardware(self, cause: str) -> None:
+        """Turn off all lights, unblock doors and resume QR scanning."""
         if self.uart_manager:
             try:
-                self.logger.info("Turning off all lights and unblocking doors - resuming normal operation") if self.logger else None
-                self.uart_manager.turn_all_lights_off()
-                # Unblock doors
-                self.uart_manager.unblock_doors()
+                self.logger.info(f"Turning off all lights and unblocking doors {cause}")
+                # Lights off and doors unblocked, sent as one burst
+                self.uart_manager.exit_locked_state()
             except Exception as e:
-                if self.logger:
-                    self.logger.error(f"Failed to turn off lights and unblock doors: {e}")
+                self.logger.error(f"Failed to turn off lights and unblock doors {cause}: {e}")
         
-        # Re-enable QR scanning
         if self.qr_scanner:
             self.qr_scanner.enable_scanning()
-            if self.logger:
-                self.logger.info("QR scanning re-enabled - device is active")
-        
-        # Log audit event
-        if self.audit_logger:
-            self.audit_logger.log_info("Device exited inactive mode - normal operations resumed")
+            self.logger.info(f"QR scanning re-enabled {cause}")
+    
+    # (locked before, locked after) -> hardware actions; other transitions change nothing
+    _LOCK_TRANSITIONS = {
+        (False, True): (_lock_hardware,),
+        (True, False): (_unlock_hardware,),
+    }
     
-    def _initialize_device_status(self) -> None:
-        """Initialize device status on startup based on database value."""
+    def _initialize_mode_from_status(self) -> None:
+        """Initialize inactive and secure mode on startup from one read of the device status flags."""
         if not self.db_manager:
-            if self.logger:
-                self.logger.warning("No database manager available for device status check")
+            self.logger.warning("No database manager available for device status check")
             return
         
         try:
-            # Get current device status from database
-            device_status = self.db_manager.device_status.get_status()
-            
-            if device_status:
-                if self.logger:
-                    self.logger.info(f"Found existing device status - active: {device_status.active}")
+            flags = self.db_manager.device_status.get_status_flags()
+        except Exception as e:
+            self.logger.error(f"Error reading initial device status: {e}")
+            # Stay active, normal mode on error
+            return
+        
+        active, is_in_safe_mode = flags if flags else (None, None)
+        self._initialize_device_status(active)
+        self._initialize_secure_mode_status(is_in_safe_mode)
+    
+    def _initialize_device_status(self, active: Optional[bool]) -> None:
+        """Initialize inactive mode on startup from the stored active flag (None if no status row)."""
+        try:
+            if active is not None:
+                self.logger.info(f"Found existing device status - active: {active}")
                 
-                if not device_status.active:
+                if not active:
                     # Device is inactive in database - enter inactive mode immediately
-                    if self.logger:
-                        self.logger.warning("Device is inactive according to database - entering inactive mode")
-                    self._enter_inactive_mode()
+                    self.logger.warning("Device is inactive according to database - entering inactive mode")
+                    self._set_lock(DeviceLock.INACTIVE, True)
                 else:
-                    # Device is active - ensure we're in active mode
-                    if self.logger:
-                        self.logger.info("Device is active according to database")
-                    self.device_inactive = False
+                    self.logger.info("Device is active according to database")
                     
                     # Initialize the API service's last active status
                     if self.api_service:
                         self.api_service._last_active_status = True
             else:
-                if self.logger:
-                    self.logger.info("No existing device status found - device will be active by default")
-                self.device_inactive = False
+                self.logger.info("No existing device status found - device will be active by default")
                 
         except Exception as e:
-            if self.logger:
-                self.logger.error(f"Error checking initial device status: {e}")
-            # Default to active mode on error
-            self.device_inactive = False
-    
-    def _on_secure_mode_change(self, secure_mode: bool) -> None:
-        """Handle secure mode status change from API service.
-        
-        Args:
-            secure_mode: True if device should be in secure mode, False otherwise
-        """
-        if self.logger:
-            self.logger.info(f"Secure mode status change: secure_mode={secure_mode}")
-        
-        if secure_mode:
-            # Device entered secure mode - activate security measures
-            self._enter_secure_mode()
-        else:
-            # Device exited secure mode - return to normal operation
-            self._exit_secure_mode()
+            self.logger.error(f"Error checking initial device status: {e}")
     
-    def _enter_secure_mode(self) -> None:
-        """Enter secure mode: turn all lights red and block doors due to server disconnection."""
-        if self.logger:
-            self.logger.warning("Entering secure mode - server disconnected for 2+ days")
-        
-        self.device_secure_mode = True
-        
-        # Turn all lights red and block doors
-        if self.uart_manager:
-            try:
-                self.logger.info("Setting all lights to red and blocking doors due to secure mode") if self.logger else None
-                # Set both cover and container lights to red
-                self.uart_manager.set_cover_light_red()
-                self.uart_manager.set_container_light_red()
-                # Block doors
-                self.uart_manager.block_doors()
-            except Exception as e:
-                if self.logger:
-                    self.logger.error(f"Failed to set red lights and block doors in secure mode: {e}")
-        
-        # Disable QR scanning
-        if self.qr_scanner:
-            self.qr_scanner.disable_scanning()
-            if self.logger:
-                self.logger.info("QR scanning disabled due to secure mode")
-        
-        # Log audit event
-        if self.audit_logger:
-            self.audit_logger.log_info("Device entered secure mode - server disconnected for 2+ days")
-    
-    def _exit_secure_mode(self) -> None:
-        """Exit secure mode: turn off lights and resume normal operation."""
-        if self.logger:
-            self.logger.info("Exiting secure mode - server connection restored")
-        
-        self.device_secure_mode = False
-        
-        # Only turn off lights and unblock doors if not in inactive mode
-        if not self.device_inactive:
-            if self.uart_manager:
-                try:
-                    self.logger.info("Turning off all lights and unblocking doors - exiting secure mode") if self.logger else None
-                    self.uart_manager.turn_all_lights_off()
-                    # Unblock doors
-                    self.uart_manager.unblock_doors()
-                except Exception as e:
-                    if self.logger:
-                        self.logger.error(f"Failed to turn off lights and unblock doors when exiting secure mode: {e}")
-            
-            # Re-enable QR scanning
-            if self.qr_scanner:
-                self.qr_scanner.enable_scanning()
-                if self.logger:
-                    self.logger.info("QR scanning re-enabled - exiting secure mode")
-        else:
-            if self.logger:
-                self.logger.info("Device still in inactive mode - keeping restrictions in place")
-        
-        # Log audit event
-        if self.audit_logger:
-            self.audit_logger.log_info("Device exited secure mode - server connection restored")
-    
-    def _initialize_secure_mode_status(self) -> None:
-        """Initialize secure mode status on startup based on database value."""
-        if not self.db_manager:
-            if self.logger:
-                self.logger.warning("No database manager available for secure mode status check")
-            return
-        
+    def _initialize_secure_mode_status(self, is_in_safe_mode: Optional[bool]) -> None:
+        """Initialize secure mode on startup from the stored safe-mode flag (None if no status row)."""
         try:
-            # Get current device status from database
-            device_status = self.db_manager.device_status.get_status()
-            
-            if device_status and device_status.is_in_safe_mode:
-                if self.logger:
-                    self.logger.warning("Device is in secure mode according to database - entering secure mode")
-                self._enter_secure_mode()
+            if is_in_safe_mode:
+                self.logger.warning("Device is in secure mode according to database - entering secure mode")
+                self._set_lock(DeviceLock.SECURE, True)
             else:
-                if self.logger:
-                    self.logger.info("Device is not in secure mode according to database")
-                self.device_secure_mode = False
+                self.logger.info("Device is not in secure mode according to database")
                 
         except Exception as e:
-            if self.logger:
-                self.logger.error(f"Error checking initial secure mode status: {e}")
-            # Default to normal mode on error
-            self.device_secure_mode = False
+            self.logger.error(f"Error checking initial secure mode status: {e}")
 
 
 def main() -> int:
@@ -12,12 +12,97 @@ import hashlib
 import base64
 import re
 import os
-from typing import Dict, Any, Optional
-from dataclasses import dataclass
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Any, Optional, Tuple
+from dataclasses import dataclass, replace
 from enum import Enum
 
 logger = logging.getLogger(__name__)
 
+# Valid results remembered for rescans of the same code (entries, seconds)
+QR_CACHE_SIZE = 1024
+QR_CACHE_TTL = 5.0
+
+# Container hashes remembered per (key, code); the scanned working set is small
+QR_HASH_CACHE_SIZE = 1024
+
+# Container URL http://paka.eco/QR/[CODE]/[HASH] at the end of a single-line scan.
+# Any prefix is accepted, since only the USB scanner trims text before "https" (the
+# fallback socket and UART paths do not); searched rather than matched behind a
+# leading '.*', so there is no backtracking over the prefix, and \Z (unlike $)
+# does not accept a trailing newline
+QR_URL_PATTERN = re.compile(
+    r'https?://paka\.eco/QR/([A-HJ-NP-Z2-9]{6})/([A-Z0-9]{6})\Z',
+    re.IGNORECASE | re.ASCII
+)
+
+# Characters allowed in CODE (Base32 without I and O) and HASH, after upper-casing
+_CODE_CHARS = frozenset('ABCDEFGHJKLMNPQRSTUVWXYZ23456789')
+_HASH_CHARS = frozenset('ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789')
+# Length of "paka.eco/QR/CODE/HASH", the part after the scheme
+_URL_TAIL_LENGTH = 25
+
+
+def _is_scheme(text: str, scheme: str) -> bool:
+    """Whether text is scheme in any letter case (ASCII only)"""
+    return text.isascii() and text.upper() == scheme
+
+
+def _split_container_url(url: str) -> Optional[Tuple[str, str]]:
+    """(CODE, HASH) of a single-line scan ending in a container URL, by slicing from
+    the end; accepts exactly what QR_URL_PATTERN finds, whatever the prefix"""
+    tail = url[-_URL_TAIL_LENGTH:]
+    # ASCII only, so upper() keeps every character at its position
+    if not tail.isascii():
+        return None
+    tail = tail.upper()
+    if len(tail) != _URL_TAIL_LENGTH or not tail.startswith('PAKA.ECO/QR/') or tail[18] != '/':
+        return None
+    if not (_is_scheme(url[-_URL_TAIL_LENGTH - 8:-_URL_TAIL_LENGTH], 'HTTPS://') or
+            _is_scheme(url[-_URL_TAIL_LENGTH - 7:-_URL_TAIL_LENGTH], 'HTTP://')):
+        return None
+    code, provided_hash = tail[12:18], tail[19:]
+    if not (_CODE_CHARS.issuperset(code) and _HASH_CHARS.issuperset(provided_hash)):
+        return None
+    return code, provided_hash
+
+
+# SHA-256 block size; HMAC keys are padded (or first hashed) to this length
+HMAC_BLOCK_SIZE = 64
+_IPAD = bytes(b ^ 0x36 for b in range(256))
+_OPAD = bytes(b ^ 0x5c for b in range(256))
+
+
+@lru_cache(maxsize=8)
+def _hmac_prefixes(private_key: str) -> Tuple["hashlib._Hash", "hashlib._Hash"]:
+    """SHA-256 states that have already absorbed the HMAC inner and outer padded
+    keys (RFC 2104); callers copy them, so each hash skips the pad block"""
+    key = private_key.encode('utf-8')
+    if len(key) > HMAC_BLOCK_SIZE:
+        key = hashlib.sha256(key).digest()
+    key = key.ljust(HMAC_BLOCK_SIZE, b'\0')
+    return hashlib.sha256(key.translate(_IPAD)), hashlib.sha256(key.translate(_OPAD))
+
+
+@lru_cache(maxsize=QR_HASH_CACHE_SIZE)
+def _container_hash(private_key: str, code: str, length: int) -> str:
+    """First length characters of the Base32 HMAC-SHA256 of code.
+
+    Keyed on the private key too, so a rotated key never returns stale hashes.
+    """
+    inner_prefix, outer_prefix = _hmac_prefixes(private_key)
+    inner = inner_prefix.copy()
+    inner.update(code.encode('utf-8'))
+    outer = outer_prefix.copy()
+    outer.update(inner.digest())
+    raw_digest = outer.digest()
+
+    # Encode with Base32 using standard library (matches JavaScript base32.js)
+    encoded = base64.b32encode(raw_digest).decode('utf-8')
+    return encoded[:length].upper()
+
 
 class ValidationResult(Enum):
     """QR code validation results."""
@@ -50,20 +135,25 @@ class QRProcessor:
     Verifies HMAC hash to prevent fraud attempts.
     """
     
-    def __init__(self, db_manager=None):
-        """Initialize the QR processor."""
+    def __init__(self, db_manager=None, regex_parse: bool = False):
+        """Initialize the QR processor.
+        
+        regex_parse parses scanned URLs with QR_URL_PATTERN instead of slicing.
+        """
         self.min_qr_length = 6
         self.max_qr_length = 200  # Increased for URL format
         self.db_manager = db_manager
         
         # QR validation configuration
         self.private_key = os.getenv('PRIVATE_KEY_QR', 'default_key')
-        self.url_pattern = re.compile(
-            r'.*https?:\/\/paka\.eco\/QR\/([A-HJ-NP-Z2-9]{6})\/([A-Z0-9]{6})$',
-            re.IGNORECASE
-        )
+        self.url_pattern = QR_URL_PATTERN
+        self.regex_parse = regex_parse
         self.hash_length = 6
         
+        # qr_code -> (monotonic time stored, valid result), oldest first
+        self._valid_cache: "OrderedDict[str, Tuple[float, QRProcessingResult]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        
         logger.info("QR processor initialized with URL validation")
     
     def process_qr_code(self, qr_code: str) -> QRProcessingResult:
@@ -81,6 +171,12 @@ class QRProcessor:
         try:
             qr_code = qr_code.strip()
             
+            # A rescan of a recently validated code gets the same answer
+            cached = self._get_cached(qr_code)
+            if cached is not None:
+                logger.debug(f"QR code validated from cache: {qr_code}")
+                return replace(cached, processing_time=time.time() - start_time)
+            
             # Step 1: Parse and validate URL format
             parsed_url = self._parse_scanned_url(qr_code)
             
@@ -105,7 +201,8 @@ class QRProcessor:
             provided_hash = parsed_url['hash']
             expected_hash = self._generate_hmac_hash(code)
             
-            if provided_hash != expected_hash:
+            # Constant-time: a mismatch position must not show in the timing
+            if not hmac.compare_digest(provided_hash, expected_hash):
                 # Invalid hash - treat as fraud attempt
                 result.validation = ValidationResult.FRAUD_ATTEMPT
                 result.is_fraud_attempt = True
@@ -120,6 +217,7 @@ class QRProcessor:
             
             logger.info(f"QR code validated successfully: {qr_code} -> {code}")
             result.processing_time = time.time() - start_time
+            self._store_cached(qr_code, result)
             return result
             
         except Exception as e:
@@ -131,6 +229,30 @@ class QRProcessor:
                 error_message=f"Processing error: {str(e)}"
             )
     
+    def _get_cached(self, qr_code: str) -> Optional[QRProcessingResult]:
+        """Return the cached valid result for a code if it is still fresh."""
+        with self._cache_lock:
+            entry = self._valid_cache.get(qr_code)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] >= QR_CACHE_TTL:
+                del self._valid_cache[qr_code]
+                return None
+            return entry[1]
+    
+    def _store_cached(self, qr_code: str, result: QRProcessingResult) -> None:
+        """Remember a valid result, evicting the oldest entry when full."""
+        with self._cache_lock:
+            self._valid_cache[qr_code] = (time.monotonic(), replace(result))
+            self._valid_cache.move_to_end(qr_code)
+            if len(self._valid_cache) > QR_CACHE_SIZE:
+                self._valid_cache.popitem(last=False)
+    
+    def clear_cache(self) -> None:
+        """Forget all cached validation results."""
+        with self._cache_lock:
+            self._valid_cache.clear()
+    
     def _parse_scanned_url(self, url: str) -> Optional[Dict[str, str]]:
         """
         Parse and validate the scanned URL format.
@@ -148,13 +270,21 @@ class QRProcessor:
         if not url or not isinstance(url, str):
             return None
         
-        match = self.url_pattern.match(url.strip())
-        if not match:
+        url = url.strip()
+        # The URL has to sit on the scan's only line
+        if '\n' in url:
+            return None
+        if self.regex_parse:
+            match = self.url_pattern.search(url)
+            parts = (match.group(1).upper(), match.group(2).upper()) if match else None
+        else:
+            parts = _split_container_url(url)
+        if parts is None:
             return None
         
         return {
-            'code': match.group(1).upper(),
-            'hash': match.group(2).upper()
+            'code': parts[0],
+            'hash': parts[1]
         }
     
     def _generate_hmac_hash(self, code: str) -> str:
@@ -167,21 +297,7 @@ class QRProcessor:
         Returns:
             6-character Base32 encoded hash
         """
-        # Create HMAC with SHA256
-        hmac_obj = hmac.new(
-            self.private_key.encode('utf-8'),
-            code.encode('utf-8'),
-            hashlib.sha256
-        )
-
-        # Get raw digest
-        raw_digest = hmac_obj.digest()
-
-        # Encode with Base32 using standard library (matches JavaScript base32.js)
-        encoded = base64.b32encode(raw_digest).decode('utf-8')
-
-        # Return first 6 characters
-        return encoded[:self.hash_length].upper()
+        return _container_hash(self.private_key, code, self.hash_length)
     
     def is_fraud_attempt(self, result: QRProcessingResult) -> bool:
         """
@@ -71,6 +71,22 @@ MODIFIER_KEYS = {
     100: "alt_right",      # Right Alt (AltGr)
 }
 
+# Flat lookup tables built from the maps above: the character code for each
+# scancode below TABLE_SIZE (0 when unmapped), and one bit per modifier scancode
+TABLE_SIZE = 128
+
+
+def _byte_table(mapping: dict) -> bytes:
+    table = bytearray(TABLE_SIZE)
+    for scancode, char in mapping.items():
+        table[scancode] = ord(char)
+    return bytes(table)
+
+
+_MAP = _byte_table(SCANCODE_MAP)
+_MAP_SHIFTED = _byte_table(SCANCODE_MAP_SHIFTED)
+_MODIFIER_MASK = sum(1 << scancode for scancode in MODIFIER_KEYS)
+
 
 def get_character(scancode: int, shift_pressed: bool = False) -> str:
     """
@@ -83,15 +99,22 @@ def get_character(scancode: int, shift_pressed: bool = False) -> str:
     Returns:
         Character string or empty string if scancode not mapped
     """
-    if shift_pressed:
-        return SCANCODE_MAP_SHIFTED.get(scancode, "")
-    else:
-        return SCANCODE_MAP.get(scancode, "")
+    if scancode >= TABLE_SIZE:
+        return ""
+    code = (_MAP_SHIFTED if shift_pressed else _MAP)[scancode]
+    return chr(code) if code else ""
+
+
+def get_byte(scancode: int, shift_pressed: bool = False) -> int:
+    """Character code for given scancode, or 0 if scancode not mapped."""
+    if scancode >= TABLE_SIZE:
+        return 0
+    return (_MAP_SHIFTED if shift_pressed else _MAP)[scancode]
 
 
 def is_modifier_key(scancode: int) -> bool:
     """Check if scancode is a modifier key."""
-    return scancode in MODIFIER_KEYS
+    return bool(_MODIFIER_MASK >> scancode & 1)
 
 
 def get_modifier_name(scancode: int) -> str:
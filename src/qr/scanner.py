@@ -2,20 +2,22 @@
 USB QR scanner for Raspberry Pi container return system.
 
 Reads QR codes from USB-connected QR scanner devices using evdev for HID device access.
-Uses file-based communication to isolate QR data from other terminal sessions.
+Completed scans are handed from the reader thread to the main thread through an in-process queue.
 """
 
 import time
 import logging
 import os
+import queue
+import selectors
+import string
 import threading
-from pathlib import Path
 from typing import Callable, Optional, Dict, Any
 from dataclasses import dataclass
 
 try:
     from evdev import InputDevice, categorize, ecodes
-    from .scancode_mapping import get_character, is_modifier_key
+    from .scancode_mapping import get_byte, is_modifier_key
     HAS_EVDEV = True
 except ImportError:
     HAS_EVDEV = False
@@ -23,6 +25,17 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Character code of the Enter key, which ends a scan
+ENTER = ord("\n")
+
+# Seconds the reader thread waits for input before rechecking whether to stop
+SCAN_POLL_INTERVAL = 0.5
+
+# Characters allowed in a scan (URLs and typical QR content); translating with
+# this table deletes them, so anything left over is not allowed
+QR_ALLOWED_CHARS = string.ascii_letters + string.digits + '-_=+/:?.{}[]()&%,'
+_DELETE_ALLOWED = str.maketrans('', '', QR_ALLOWED_CHARS)
+
 
 @dataclass
 class QRScanEvent:
@@ -34,10 +47,10 @@ class QRScanEvent:
 
 class QRScanner:
     """
-    USB QR scanner using evdev for HID device access with file-based communication.
+    USB QR scanner using evdev for HID device access.
     
     Reads QR codes from USB QR scanner devices using evdev to access HID devices directly.
-    Uses temporary file to isolate QR data from other terminal sessions.
+    The reader thread queues completed scans; check_for_scans processes them on the caller's thread.
     """
     
     def __init__(self, uart_manager=None, audit_logger=None, device_path="/dev/hidraw2"):
@@ -47,7 +60,7 @@ class QRScanner:
         
         self._running = False
         self._scan_callbacks: list = []
-        self._current_scan = ""
+        self._current_scan = bytearray()  # ASCII codes of the scan in progress
         self._last_char_time = time.time()
         self._scanner_thread = None
         self._shift_pressed = False
@@ -62,7 +75,7 @@ class QRScanner:
         self.scan_timeout = 2.0  # Max time between characters
         self.scan_enabled = True  # Can be toggled to ignore keyboard input
         self.device_path = device_path
-        self.qr_file_path = Path("qr_scan_data.txt")
+        self._scan_queue: "queue.SimpleQueue[str]" = queue.SimpleQueue()
         
         # Verify device access
         self._verify_device_access()
@@ -112,15 +125,24 @@ class QRScanner:
             device = InputDevice(self.device_path)
             logger.info(f"Listening for QR scans on {device.name} ({self.device_path})")
             
-            for event in device.read_loop():
-                if not self._running:
-                    break
-                
-                if not self.scan_enabled:
-                    continue
-                
-                if event.type == ecodes.EV_KEY and event.value == 1:  # Key down
-                    self._process_evdev_keypress(event.code)
+            # Wait for input with a timeout so stop_scanning is noticed while idle,
+            # then drain every queued event with one read
+            with selectors.DefaultSelector() as selector:
+                selector.register(device.fd, selectors.EVENT_READ)
+                while self._running:
+                    if not selector.select(SCAN_POLL_INTERVAL):
+                        continue
+                    try:
+                        events = list(device.read())
+                    except BlockingIOError:
+                        continue
+                    
+                    if not self.scan_enabled:
+                        continue
+                    
+                    for event in events:
+                        if event.type == ecodes.EV_KEY and event.value == 1:  # Key down
+                            self._process_evdev_keypress(event.code)
                     
         except Exception as e:
             logger.error(f"Error in evdev scan loop: {e}")
@@ -139,8 +161,8 @@ class QRScanner:
                     self._shift_pressed = True
                 return
             
-            # Get character for this scancode
-            char = get_character(scancode, self._shift_pressed)
+            # Get character code for this scancode
+            char = get_byte(scancode, self._shift_pressed)
             
             # Reset shift state after processing
             self._shift_pressed = False
@@ -149,61 +171,38 @@ class QRScanner:
                 return
             
             # Handle Enter key - end of scan
-            if char == "\n":
+            if char == ENTER:
                 if self._current_scan:
-                    self._write_qr_to_file(self._current_scan.strip())
-                    self._current_scan = ""
+                    self._queue_scan(self._current_scan.decode('ascii').strip())
+                    self._current_scan.clear()
                 return
             
             # Reset scan if too much time passed
             if current_time - self._last_char_time > self.scan_timeout:
-                self._current_scan = ""
+                self._current_scan.clear()
             
-            self._current_scan += char
+            self._current_scan.append(char)
             self._last_char_time = current_time
             
             # Safety check for overly long scans
             if len(self._current_scan) > self.max_qr_length:
-                logger.warning(f"QR scan too long, resetting: {self._current_scan[:20]}...")
-                self._current_scan = ""
+                logger.warning(f"QR scan too long, resetting: {self._current_scan[:20].decode('ascii')}...")
+                self._current_scan.clear()
                 
         except Exception as e:
             logger.error(f"Error processing evdev keypress: {e}")
     
-    def _write_qr_to_file(self, qr_code: str):
-        """Write QR code to temporary file atomically."""
-        try:
-            # Use atomic write to prevent race conditions
-            temp_path = self.qr_file_path.with_suffix('.tmp')
-            with open(temp_path, 'w') as f:
-                f.write(qr_code)
-            temp_path.replace(self.qr_file_path)
-            logger.debug(f"QR code written to file: {qr_code}")
-        except Exception as e:
-            logger.error(f"Failed to write QR to file: {e}")
+    def _queue_scan(self, qr_code: str):
+        """Hand a completed scan to the thread calling check_for_scans."""
+        if qr_code:
+            self._scan_queue.put(qr_code)
+            logger.debug(f"QR code queued: {qr_code}")
     
-    def _read_qr_from_file(self) -> Optional[str]:
-        """Read QR code from temporary file and clear it atomically."""
+    def _next_scan(self) -> Optional[str]:
+        """Take the oldest queued scan, or None when there is none."""
         try:
-            if not self.qr_file_path.exists():
-                return None
-            
-            # Read and delete atomically to prevent race conditions
-            try:
-                with open(self.qr_file_path, 'r') as f:
-                    qr_code = f.read().strip()
-                
-                # Clear the file after reading
-                self.qr_file_path.unlink()
-                
-                return qr_code if qr_code else None
-                
-            except FileNotFoundError:
-                # File was already processed by another thread
-                return None
-            
-        except Exception as e:
-            logger.error(f"Failed to read QR from file: {e}")
+            return self._scan_queue.get_nowait()
+        except queue.Empty:
             return None
     
     def stop_scanning(self):
@@ -216,12 +215,9 @@ class QRScanner:
         if self._scanner_thread:
             self._scanner_thread = None
         
-        # Clean up temporary file
-        try:
-            if self.qr_file_path.exists():
-                self.qr_file_path.unlink()
-        except Exception as e:
-            logger.warning(f"Failed to clean up QR file: {e}")
+        # Drop scans nobody will process
+        while self._next_scan() is not None:
+            pass
         
         logger.info("QR scanner stopped")
     
@@ -233,7 +229,7 @@ class QRScanner:
     def disable_scanning(self):
         """Disable QR scan processing (ignore keyboard input)."""
         self.scan_enabled = False
-        self._current_scan = ""  # Clear any partial scan
+        self._current_scan.clear()  # Clear any partial scan
         logger.debug("QR scanning disabled")
     
     
@@ -309,9 +305,8 @@ class QRScanner:
         if len(qr_code) < self.min_qr_length or len(qr_code) > self.max_qr_length:
             return False
 
-        # Check for valid characters (URLs and typical QR content)
-        # Added: & % , for URL parameters and encoding
-        if not all(c.isalnum() or c in '-_=+/:?.{}[]()&%,' for c in qr_code):
+        # Check for valid characters (ASCII only)
+        if qr_code.translate(_DELETE_ALLOWED):
             return False
 
         return True
@@ -342,18 +337,18 @@ class QRScanner:
     
     def check_for_scans(self):
         """
-        Check for QR scans from file or handle partial scan timeouts.
+        Process queued QR scans in order and handle partial scan timeouts.
         """
-        # Check for QR code in file
-        qr_code = self._read_qr_from_file()
-        if qr_code:
+        qr_code = self._next_scan()
+        while qr_code is not None:
             self._process_scan(qr_code)
+            qr_code = self._next_scan()
         
         # Check for timeout on partial scans (thread-safe check)
         current_time = time.time()
         if self._current_scan and (current_time - self._last_char_time > self.scan_timeout):
             logger.debug("Clearing timed-out partial QR scan")
-            self._current_scan = ""
+            self._current_scan.clear()
     
     def get_status(self) -> Dict[str, Any]:
         """Get scanner status."""
@@ -364,7 +359,7 @@ class QRScanner:
             "callbacks_registered": len(self._scan_callbacks),
             "current_scan_length": len(self._current_scan),
             "device_path": self.device_path,
-            "qr_file_exists": self.qr_file_path.exists(),
+            "queued_scans": self._scan_queue.qsize(),
             "scanner_thread_active": self._scanner_thread is not None and self._scanner_thread.is_alive() if self._scanner_thread else False
         }
     
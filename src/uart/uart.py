@@ -31,7 +31,7 @@ Frame Structure:
 """
 
 import struct
-from datetime import datetime, timezone
+from datetime import datetime
 
 import serial
 import logging
@@ -40,6 +40,9 @@ from typing import Optional, List, Any, Dict, Callable
 from enum import IntEnum
 from dataclasses import dataclass
 
+from ..database.models import from_epoch, to_epoch
+from ..qr.processor import ValidationResult
+
 logger = logging.getLogger(__name__)
 
 
@@ -230,9 +233,11 @@ class UART:
     - Error Msg (0x07): Error messages from micro
     """
 
-    def __init__(self, port: str = "COM8", baudrate: int = 9600, db_manager=None, debug_mode=False):
+    def __init__(self, port: str = "COM8", baudrate: int = 9600, db_manager=None, debug_mode=False,
+                 low_latency: bool = True):
         self.port = port
         self.baudrate = baudrate
+        self.low_latency = low_latency
         self.serial_connection: Optional[serial.Serial] = None
         self.message_id_counter = 0
         self.db_manager = db_manager
@@ -310,12 +315,29 @@ class UART:
                 baudrate=self.baudrate,
                 timeout=1.0
             )
+            if self.low_latency:
+                self._enable_low_latency()
             logger.info(f"Connected to {self.port} at {self.baudrate}")
             return True
         except Exception as e:
             logger.error(f"Connection failed: {e}")
             return False
 
+    def _enable_low_latency(self) -> None:
+        """Ask the USB-serial driver to flush short frames immediately"""
+        # pyserial only exposes this on POSIX (TIOCSSERIAL with ASYNC_LOW_LATENCY);
+        # on Windows the FTDI latency timer is a driver setting
+        set_low_latency_mode = getattr(self.serial_connection, 'set_low_latency_mode', None)
+        if set_low_latency_mode is None:
+            logger.debug(f"Low-latency mode not supported on {self.port}")
+            return
+        try:
+            set_low_latency_mode(True)
+            logger.info(f"Low-latency mode enabled on {self.port}")
+        except (OSError, ValueError) as e:
+            # Pseudo terminals and some adapters reject the ioctl
+            logger.debug(f"Low-latency mode unavailable on {self.port}: {e}")
+
     def disconnect(self) -> None:
         """Disconnect from COM port"""
         if self.serial_connection:
@@ -351,6 +373,32 @@ class UART:
             logger.error(f"Send failed: {e}")
             return False
 
+    def send_messages(self, messages: List[tuple]) -> bool:
+        """Send several (msg_type, payload) messages back to back in one serial write"""
+        if not self.serial_connection:
+            logger.error("UART not connected")
+            return False
+
+        try:
+            frames = []
+            for msg_type, payload in messages:
+                msg_id = self.get_next_message_id()
+                frames.append(UARTProtocol.encode_message(UARTMessage(msg_type, msg_id, payload)))
+            data = b''.join(frames)
+
+            bytes_written = self.serial_connection.write(data)
+            if bytes_written is not None and bytes_written > 0:
+                logger.debug(f"Sent {len(frames)} messages: "
+                             f"{', '.join(msg_type.name for msg_type, _ in messages)} - {bytes_written} bytes")
+                return True
+            else:
+                logger.error(f"Failed to send {len(frames)} messages")
+                return False
+
+        except Exception as e:
+            logger.error(f"Send failed: {e}")
+            return False
+
     def send_ack(self, original_message: UARTMessage) -> bool:
         """Send ACK for received message"""
         if not self.serial_connection:
@@ -515,6 +563,23 @@ class UART:
         """Unblock doors"""
         return self.control_door(DoorAction.UNBLOCK)
 
+    # Combined lock-down commands, written as one burst of frames
+    def enter_locked_state(self) -> bool:
+        """Set both lights red and block doors"""
+        return self.send_messages([
+            (MessageType.LIGHT_MANAGEMENT, struct.pack('<BBB', LightPosition.COVER, LightColor.RED_ON, LightType.STEADY)),
+            (MessageType.LIGHT_MANAGEMENT, struct.pack('<BBB', LightPosition.CONTAINER, LightColor.RED_ON, LightType.STEADY)),
+            (MessageType.DOOR_CONTROL, struct.pack('<B', DoorAction.BLOCK)),
+        ])
+
+    def exit_locked_state(self) -> bool:
+        """Turn off all lights and unblock doors"""
+        return self.send_messages([
+            (MessageType.LIGHT_MANAGEMENT, struct.pack('<BBB', LightPosition.CONTAINER, LightColor.DISABLE_ALL, LightType.STEADY)),
+            (MessageType.LIGHT_MANAGEMENT, struct.pack('<BBB', LightPosition.COVER, LightColor.DISABLE_ALL, LightType.STEADY)),
+            (MessageType.DOOR_CONTROL, struct.pack('<B', DoorAction.UNBLOCK)),
+        ])
+
     def wait_for_ack(self, timeout: float = 5.0) -> bool:
         """
         Wait for ACK from micro with timeout.
@@ -869,7 +934,7 @@ class UART:
             qr_result = self.qr_processor.process_qr_code(qr_code)
             
             # Step 2: Check for fraud attempts
-            if qr_result.is_fraud_attempt or qr_result.validation.value == "fraud_attempt":
+            if qr_result.is_fraud_attempt or qr_result.validation is ValidationResult.FRAUD_ATTEMPT:
                 logger.warning(f"Fraud attempt detected: {qr_result.error_message}")
                 # Log fraud attempt to audit system
                 if self.audit_logger:
@@ -885,7 +950,7 @@ class UART:
                 return False
             
             # Step 3: Check if QR validation passed
-            if qr_result.validation.value != "valid" or not qr_result.container_id:
+            if qr_result.validation is not ValidationResult.VALID or not qr_result.container_id:
                 logger.warning(f"QR validation failed: {qr_result.error_message}")
                 return False
             
@@ -914,20 +979,20 @@ class UART:
                 logger.warning("No API service or database manager available for server validation")
                 return None
 
-            # First, get container from local database using QR code
-            container = self.db_manager.containers.get_by_qr_code(qr_code)
-            if not container:
+            # First, get container ID from local database using QR code
+            container_id = self.db_manager.containers.get_id_by_qr_code(qr_code)
+            if not container_id:
                 logger.warning(f"Container not found in local database for QR: {qr_code}")
                 return None
 
-            logger.info(f"Validating container {container.id} with server (QR: {qr_code})")
-            response = self.api_service.validate_container(container.id)
+            logger.info(f"Validating container {container_id} with server (QR: {qr_code})")
+            response = self.api_service.validate_container(container_id)
 
             if response:
-                logger.info(f"Server response received for container {container.id}")
+                logger.info(f"Server response received for container {container_id}")
                 return response
             else:
-                logger.warning(f"Server validation failed for container {container.id}")
+                logger.warning(f"Server validation failed for container {container_id}")
                 return None
 
         except Exception as e:
@@ -945,10 +1010,13 @@ class UART:
             logger.debug(f"Extracted isReturnable: {is_returnable}, containerData: {container_data}")
 
             logger.info(f"Server response - isReturnable: {is_returnable}")
-            container = self.db_manager.containers.get_by_qr_code(qr_code)
+            container_id = self.db_manager.containers.get_id_by_qr_code(qr_code)
+            if container_id is None:
+                logger.error(f"Container not found in local database for QR: {qr_code}")
+                return False
             # Update local database with server response
             if container_data:
-                container_data['id'] = container.id
+                container_data['id'] = container_id
                 self._update_local_container(qr_code, container_data)
 
             # Server validation logic based on isReturnable field
@@ -959,8 +1027,9 @@ class UART:
 
                 if self.audit_logger:
                     self.audit_logger.log_return_invalid(
-                        container.id,
-                        f"Server rejection - QR: {qr_code}, Reason: {reason}"
+                        container_id,
+                        "Server rejection - QR: %s, Reason: %s",
+                        args=(qr_code, reason)
                     )
                 return False
             else:
@@ -969,8 +1038,9 @@ class UART:
 
                 if self.audit_logger:
                     self.audit_logger.log_return_valid(
-                        container.id,
-                        f"Server acceptance - QR: {qr_code}"
+                        container_id,
+                        "Server acceptance - QR: %s",
+                        args=(qr_code,)
                     )
                 return True
 
@@ -1000,21 +1070,23 @@ class UART:
                 if self.audit_logger:
                     self.audit_logger.log_return_invalid(
                         container.id,
-                        f"Offline validation failed - not returnable - QR: {qr_code}",
-                        is_offline=True
+                        "Offline validation failed - not returnable - QR: %s",
+                        is_offline=True,
+                        args=(qr_code,)
                     )
                 return False
 
             # Check due date if present
-            if container.due_date:
-                current_time = datetime.now(timezone.utc)
+            if container.due_date is not None:
+                current_time = int(time.time())
                 if container.due_date < current_time:
                     logger.warning(f"Container expired - due: {container.due_date}, current: {current_time}")
                     if self.audit_logger:
                         self.audit_logger.log_return_invalid(
                             container.id,
-                            f"Offline validation failed - expired - QR: {qr_code}, Due: {container.due_date.isoformat()}",
-                            is_offline=True
+                            "Offline validation failed - expired - QR: %s, Due: %s",
+                            is_offline=True,
+                            args=(qr_code, from_epoch(container.due_date).isoformat())
                         )
                     return False
 
@@ -1023,8 +1095,9 @@ class UART:
             if self.audit_logger:
                 self.audit_logger.log_return_valid(
                     container.id,
-                    f"Offline validation success - QR: {qr_code}",
-                    is_offline=True
+                    "Offline validation success - QR: %s",
+                    is_offline=True,
+                    args=(qr_code,)
                 )
             return True
 
@@ -1061,9 +1134,9 @@ class UART:
                     logger.warning(f"Invalid updatedAt timestamp: {updated_at_str} - {e}")
 
             # Check if container exists
-            existing_container = self.db_manager.containers.get_by_qr_code(qr_code)
+            existing_id = self.db_manager.containers.get_id_by_qr_code(qr_code)
 
-            if existing_container:
+            if existing_id:
                 # Update existing container
                 updates = {}
                 if is_returnable is not None:
@@ -1073,7 +1146,7 @@ class UART:
                     updates['updatedAt'] = updated_at.isoformat()
 
                 if updates:
-                    self.db_manager.containers.update(existing_container.id, updates)
+                    self.db_manager.containers.update(existing_id, updates)
                     logger.info(f"Updated existing container {container_id} with server data")
             else:
                 # Create new container
@@ -1081,7 +1154,7 @@ class UART:
                 container_create = ContainerCreate(
                     qr_code=qr_code,
                     is_returnable=is_returnable if is_returnable is not None else True,
-                    due_date=updated_at  # Using updatedAt as due_date if no specific due_date
+                    due_date=to_epoch(updated_at) if updated_at else None  # Using updatedAt as due_date if no specific due_date
                 )
                 self.db_manager.containers.create(container_create)
                 logger.info(f"Created new container {container_id} from server data")